@@ -0,0 +1,47 @@
+"""add user pack progress counters
+
+Revision ID: 3f6b2d9e1a47
+Revises: 87ac8689a9c0
+Create Date: 2026-10-17 09:12:41.503218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6b2d9e1a47'
+down_revision: Union[str, None] = '87ac8689a9c0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Number of distinct cards of each pack a user owns, kept up to date by open_packs and sells
+    op.create_table(
+        "user_pack_progress",
+        sa.Column("user_id", sa.Integer, primary_key=True),
+        sa.Column("pack_id", sa.Integer, primary_key=True),
+        sa.Column("owned_cards", sa.Integer, nullable=False, server_default="0"),
+        sa.CheckConstraint("owned_cards >= 0", name="check_owned_cards_positive"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], name="fk_progress_user_id", ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["pack_id"], ["packs.id"], name="fk_progress_pack_id", ondelete="CASCADE"),
+    )
+    op.execute(sa.text(
+        """
+        INSERT INTO user_pack_progress (user_id, pack_id, owned_cards)
+        SELECT col.user_id, c.pack_id, COUNT(*)
+        FROM collection AS col
+        JOIN cards AS c ON c.id = col.card_id
+        WHERE col.quantity > 0
+        GROUP BY col.user_id, c.pack_id
+        """
+    ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("user_pack_progress")
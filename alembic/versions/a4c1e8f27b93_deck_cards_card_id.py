@@ -0,0 +1,81 @@
+"""key deck_cards by integer card_id instead of card_name
+
+Revision ID: a4c1e8f27b93
+Revises: 3f6b2d9e1a47
+Create Date: 2026-10-17 14:03:27.918364
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4c1e8f27b93'
+down_revision: Union[str, None] = '3f6b2d9e1a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("deck_cards", sa.Column("card_id", sa.Integer, nullable=True))
+    op.execute(sa.text(
+        """
+        UPDATE deck_cards AS dc
+        SET card_id = c.id
+        FROM cards AS c
+        WHERE c.name = dc.card_name
+        """
+    ))
+    # Rows naming a card that no longer exists, and repeats of the same card in a deck, can't be keyed
+    op.execute(sa.text("DELETE FROM deck_cards WHERE card_id IS NULL"))
+    op.execute(sa.text(
+        """
+        DELETE FROM deck_cards AS a
+        USING deck_cards AS b
+        WHERE a.ctid < b.ctid
+          AND a.deck_id = b.deck_id
+          AND a.card_id = b.card_id
+        """
+    ))
+
+    # The table was created with a serial id key and later re-keyed by hand (see schema.sql),
+    # so drop whichever key is there. Dropping card_name also drops its foreign key and indexes.
+    op.execute(sa.text("ALTER TABLE deck_cards DROP CONSTRAINT IF EXISTS deck_cards_pkey"))
+    op.execute(sa.text("ALTER TABLE deck_cards DROP COLUMN IF EXISTS id"))
+    op.drop_column("deck_cards", "card_name")
+
+    op.alter_column("deck_cards", "card_id", nullable=False)
+    op.create_primary_key("deck_cards_pkey", "deck_cards", ["deck_id", "card_id"])
+    op.create_foreign_key(
+        "fk_deck_cards_card_id", "deck_cards", "cards", ["card_id"], ["id"], ondelete="CASCADE"
+    )
+    # Serves "is this card in any of the user's decks" checks when selling
+    op.create_index("ix_deck_cards_card_id_deck_id", "deck_cards", ["card_id", "deck_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column("deck_cards", sa.Column("card_name", sa.Text, nullable=True))
+    op.execute(sa.text(
+        """
+        UPDATE deck_cards AS dc
+        SET card_name = c.name
+        FROM cards AS c
+        WHERE c.id = dc.card_id
+        """
+    ))
+    op.drop_index("ix_deck_cards_card_id_deck_id", table_name="deck_cards")
+    op.drop_constraint("deck_cards_pkey", "deck_cards", type_="primary")
+    op.drop_column("deck_cards", "card_id")
+    op.alter_column("deck_cards", "card_name", nullable=False)
+    op.create_primary_key("deck_cards_pkey", "deck_cards", ["deck_id", "card_name"])
+    # Dropping card_name in the upgrade also dropped its foreign key. The key needs card names to be
+    # unique, which schema.sql only made them by hand, so (re)create that constraint first.
+    op.execute(sa.text("ALTER TABLE cards DROP CONSTRAINT IF EXISTS cards_name_unique"))
+    op.create_unique_constraint("cards_name_unique", "cards", ["name"])
+    op.create_foreign_key(
+        "fk_deck_cards_card", "deck_cards", "cards", ["card_name"], ["name"], ondelete="CASCADE"
+    )
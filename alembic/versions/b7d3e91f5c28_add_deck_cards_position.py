@@ -0,0 +1,43 @@
+"""keep the order of cards within a deck
+
+Revision ID: b7d3e91f5c28
+Revises: e83f4a6c2d51
+Create Date: 2026-10-17 23:20:41.508213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d3e91f5c28'
+down_revision: Union[str, None] = 'e83f4a6c2d51'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 1-based position of each card in the order the deck was created with
+    op.add_column("deck_cards", sa.Column("position", sa.SmallInteger, nullable=True))
+    # The serial id that recorded insertion order went away in a4c1e8f27b93; the physical
+    # row order is what is left of it for existing decks
+    op.execute(sa.text(
+        """
+        UPDATE deck_cards AS dc
+        SET position = numbered.position
+        FROM (
+            SELECT deck_id, card_id, row_number() OVER (PARTITION BY deck_id ORDER BY ctid) AS position
+            FROM deck_cards
+        ) AS numbered
+        WHERE dc.deck_id = numbered.deck_id AND dc.card_id = numbered.card_id
+        """
+    ))
+    op.alter_column("deck_cards", "position", nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("deck_cards", "position")
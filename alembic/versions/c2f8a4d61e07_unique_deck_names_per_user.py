@@ -0,0 +1,42 @@
+"""make deck names unique per user
+
+Revision ID: c2f8a4d61e07
+Revises: b7d3e91f5c28
+Create Date: 2026-10-18 09:12:37.904162
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2f8a4d61e07'
+down_revision: Union[str, None] = 'b7d3e91f5c28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Concurrent creates could give a user two decks with the same name; keep the
+    # oldest under its name and suffix the others with their id, so no deck is lost
+    op.execute(sa.text(
+        """
+        UPDATE decks AS d
+        SET deck_name = d.deck_name || '_' || d.id
+        WHERE EXISTS (
+            SELECT 1 FROM decks AS older
+            WHERE older.user_id = d.user_id
+              AND older.deck_name = d.deck_name
+              AND older.id < d.id
+        )
+        """
+    ))
+    op.create_index("ux_decks_user_id_deck_name", "decks", ["user_id", "deck_name"], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ux_decks_user_id_deck_name", table_name="decks")
@@ -0,0 +1,102 @@
+"""store battle stats on decks
+
+Revision ID: d5e27c0b9f14
+Revises: a4c1e8f27b93
+Create Date: 2026-10-17 16:48:05.217730
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5e27c0b9f14'
+down_revision: Union[str, None] = 'a4c1e8f27b93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Card prices count toward a deck's strength up to this value (decks.MAX_CARD_PRICE)
+MAX_CARD_PRICE = 100
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Sum, max and min of the deck's card prices, each capped at MAX_CARD_PRICE
+    op.add_column("decks", sa.Column("card_count", sa.Integer, nullable=False, server_default="0"))
+    op.add_column("decks", sa.Column("value_sum", sa.Integer, nullable=False, server_default="0"))
+    op.add_column("decks", sa.Column("highest_value", sa.Integer, nullable=False, server_default="0"))
+    op.add_column("decks", sa.Column("lowest_value", sa.Integer, nullable=False, server_default="0"))
+    op.execute(sa.text(
+        """
+        ALTER TABLE decks ADD COLUMN win_prob DOUBLE PRECISION GENERATED ALWAYS AS (
+            CASE WHEN card_count > 0 THEN
+                LEAST(1, GREATEST(0, 0.01 * (
+                    30
+                    + CAST(value_sum AS DOUBLE PRECISION) / card_count * 0.4
+                    + highest_value * 0.2
+                    + lowest_value * 0.1
+                )))
+            END
+        ) STORED
+        """
+    ))
+
+    op.execute(sa.text(
+        f"""
+        CREATE FUNCTION refresh_deck_stats(deck_ids INTEGER[]) RETURNS void LANGUAGE sql AS $$
+            UPDATE decks AS d
+            SET card_count = s.card_count,
+                value_sum = s.value_sum,
+                highest_value = s.highest_value,
+                lowest_value = s.lowest_value
+            FROM (
+                SELECT dc.deck_id,
+                       COUNT(*) AS card_count,
+                       SUM(LEAST(c.price, {MAX_CARD_PRICE})) AS value_sum,
+                       MAX(LEAST(c.price, {MAX_CARD_PRICE})) AS highest_value,
+                       MIN(LEAST(c.price, {MAX_CARD_PRICE})) AS lowest_value
+                FROM deck_cards AS dc
+                JOIN cards AS c ON c.id = dc.card_id
+                WHERE dc.deck_id = ANY(deck_ids)
+                GROUP BY dc.deck_id
+            ) AS s
+            WHERE d.id = s.deck_id
+        $$
+        """
+    ))
+    op.execute(sa.text("SELECT refresh_deck_stats(ARRAY(SELECT id FROM decks))"))
+
+    # Cards are reference data, but if a price is ever changed every deck holding the card is rescored
+    op.execute(sa.text(
+        """
+        CREATE FUNCTION refresh_deck_stats_for_card() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM refresh_deck_stats(ARRAY(SELECT deck_id FROM deck_cards WHERE card_id = NEW.id));
+            RETURN NULL;
+        END
+        $$
+        """
+    ))
+    op.execute(sa.text(
+        """
+        CREATE TRIGGER cards_price_refresh_deck_stats
+        AFTER UPDATE OF price ON cards
+        FOR EACH ROW
+        WHEN (OLD.price IS DISTINCT FROM NEW.price)
+        EXECUTE FUNCTION refresh_deck_stats_for_card()
+        """
+    ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(sa.text("DROP TRIGGER cards_price_refresh_deck_stats ON cards"))
+    op.execute(sa.text("DROP FUNCTION refresh_deck_stats_for_card()"))
+    op.execute(sa.text("DROP FUNCTION refresh_deck_stats(INTEGER[])"))
+    op.drop_column("decks", "win_prob")
+    op.drop_column("decks", "lowest_value")
+    op.drop_column("decks", "highest_value")
+    op.drop_column("decks", "value_sum")
+    op.drop_column("decks", "card_count")
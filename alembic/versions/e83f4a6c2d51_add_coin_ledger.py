@@ -0,0 +1,69 @@
+"""add coin ledger and user_balances view
+
+Revision ID: e83f4a6c2d51
+Revises: d5e27c0b9f14
+Create Date: 2026-10-17 19:26:52.640118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e83f4a6c2d51'
+down_revision: Union[str, None] = 'd5e27c0b9f14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Coin credits appended in ledger mode (settings.COIN_LEDGER); compaction adds them to users.coins
+    op.create_table(
+        "coin_ledger",
+        sa.Column("id", sa.BigInteger, sa.Identity(always=True), primary_key=True),
+        sa.Column("user_id", sa.Integer, nullable=False),
+        sa.Column("amount", sa.Integer, nullable=False),
+        sa.Column("reason", sa.Text, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column("applied", sa.Boolean, nullable=False, server_default=sa.false()),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], name="fk_coin_ledger_user_id", ondelete="CASCADE"),
+    )
+    # Only unapplied entries are ever looked up by user
+    op.create_index(
+        "ix_coin_ledger_pending_user_id", "coin_ledger", ["user_id"],
+        postgresql_where=sa.text("NOT applied")
+    )
+    op.execute(sa.text(
+        """
+        CREATE VIEW user_balances AS
+        SELECT u.id AS user_id,
+               u.coins + COALESCE((
+                   SELECT SUM(l.amount) FROM coin_ledger AS l
+                   WHERE l.user_id = u.id AND NOT l.applied
+               ), 0) AS coins
+        FROM users AS u
+        """
+    ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Fold any pending credits back into users.coins before dropping the ledger
+    op.execute(sa.text(
+        """
+        UPDATE users
+        SET coins = users.coins + pending.amount
+        FROM (
+            SELECT user_id, SUM(amount) AS amount FROM coin_ledger
+            WHERE NOT applied
+            GROUP BY user_id
+        ) AS pending
+        WHERE users.id = pending.user_id
+        """
+    ))
+    op.execute(sa.text("DROP VIEW user_balances"))
+    op.drop_index("ix_coin_ledger_pending_user_id", table_name="coin_ledger")
+    op.drop_table("coin_ledger")
@@ -0,0 +1,87 @@
+"""
+Load test for comparing the threadpool endpoints with the async engine mode
+(settings.ASYNC_DB) at high concurrency.
+
+Drives a running server over HTTP with a fixed number of concurrent clients
+hitting database-bound read endpoints, and reports throughput and latency
+percentiles per concurrency level. Start the server once per mode against the
+same database, e.g.
+
+    ASYNC_DB=false uvicorn src.api.server:app --port 3000
+    ASYNC_DB=true uvicorn src.api.server:app --port 3000
+
+and run from the repository root, once against each:
+    python -m benchmarks.bench_async_db --url http://localhost:3000 --user-id 1
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from src import config
+
+CONCURRENCY_LEVELS = (10, 50, 200, 500)
+REQUESTS_PER_LEVEL = 5000
+ENDPOINTS = ("/users/profile/{user_id}", "/inventory/{user_id}/audit", "/decks/{user_id}/decks")
+
+
+async def run_level(client: httpx.AsyncClient, paths: list[str], concurrency: int, total: int) -> dict:
+    """Sends `total` requests from `concurrency` workers and collects the latencies."""
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in remaining:
+            start = time.perf_counter()
+            try:
+                response = await client.get(paths[i % len(paths)])
+                if response.status_code >= 500:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "concurrency": concurrency,
+        "throughput": total / elapsed,
+        "p50": quantiles[49] * 1000,
+        "p99": quantiles[98] * 1000,
+        "errors": errors,
+    }
+
+
+async def main(url: str, user_id: int, levels: tuple[int, ...], total: int):
+    paths = [endpoint.format(user_id=user_id) for endpoint in ENDPOINTS]
+    headers = {"access_token": config.get_settings().API_KEY}
+    # One connection per client, so the server sees the full concurrency
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=url, headers=headers, limits=limits, timeout=60) as client:
+        await run_level(client, paths, min(levels), min(levels) * 10)  # warm up the pools
+
+        print("| Concurrency | Requests/s | p50 (ms) | p99 (ms) | Errors |")
+        print("|---|---|---|---|---|")
+        for concurrency in levels:
+            result = await run_level(client, paths, concurrency, total)
+            print(
+                f"| {result['concurrency']} | {result['throughput']:,.0f} | {result['p50']:.1f} "
+                f"| {result['p99']:.1f} | {result['errors']} |"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:3000")
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=REQUESTS_PER_LEVEL)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=CONCURRENCY_LEVELS)
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.user_id, tuple(args.concurrency), args.requests))
@@ -0,0 +1,69 @@
+"""
+Compares draws per second of packs.weighted_random_choice against the alias-table
+AliasSampler used by open_packs, and checks that both use the same distribution.
+
+Run from the repository root:
+    python -m benchmarks.bench_pack_sampler
+"""
+import math
+import time
+
+import numpy as np
+
+from src.api.packs import weighted_random_choice
+from src.sampling import AliasSampler
+
+# Card prices of 'Shrouded Fable' as seeded by migration b825c97e31ba
+PRICES = [10, 20, 30, 10, 20, 10, 20, 30, 30, 50, 20, 30, 50, 20, 40, 20, 40, 20, 40, 500]
+CARD_IDS = list(range(1, len(PRICES) + 1))
+
+
+def implied_probabilities(sampler: AliasSampler) -> np.ndarray:
+    """Reconstructs the exact per-key probability encoded in the alias tables."""
+    n = len(sampler.keys)
+    probs = sampler._accept.copy()
+    np.add.at(probs, sampler._alias, 1.0 - sampler._accept)
+    return probs / n
+
+
+def time_draws(label: str, draw, total_draws: int, min_seconds: float = 0.5) -> float:
+    draw()  # warm up
+    rounds = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_seconds:
+        draw()
+        rounds += 1
+    elapsed = time.perf_counter() - start
+    rate = rounds * total_draws / elapsed
+    print(f"{label:<48} {rate:>14,.0f} draws/s")
+    return rate
+
+
+def main():
+    sampler = AliasSampler.from_prices(CARD_IDS, PRICES)
+
+    max_price = max(PRICES)
+    weights = np.array([math.sqrt(max_price - price + 1) for price in PRICES])
+    expected = weights / weights.sum()
+    error = np.abs(implied_probabilities(sampler) - expected).max()
+    print(f"max |alias - sqrt weighting| probability error: {error:.2e}")
+
+    items = list(zip(CARD_IDS, PRICES))
+    for pack_quantity in (1, 50, 1000):
+        k = 5 * pack_quantity
+        print(f"\n{pack_quantity} pack(s), {k} draws")
+        baseline = time_draws(
+            "weighted_random_choice (one call per card)",
+            lambda: [weighted_random_choice(items) for _ in range(k)],
+            k,
+        )
+        alias = time_draws("AliasSampler.draw (one vectorized call)", lambda: sampler.draw(k), k)
+        print(f"{'speedup':<48} {alias / baseline:>14.1f}x")
+
+    draws = sampler.draw(5_000_000)
+    observed = np.bincount(draws, minlength=len(CARD_IDS) + 1)[1:] / len(draws)
+    print(f"\nmax |observed - expected| frequency over 5M draws: {np.abs(observed - expected).max():.2e}")
+
+
+if __name__ == "__main__":
+    main()
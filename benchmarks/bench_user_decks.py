@@ -0,0 +1,95 @@
+"""
+Compares listing a user's decks with one query per deck (the previous
+get_user_decks) against the single aggregated query, for users with many decks.
+
+Needs the database from POSTGRES_URI. The decks are created for a throwaway user
+inside a transaction that is rolled back, so nothing is left behind.
+
+Run from the repository root:
+    python -m benchmarks.bench_user_decks
+"""
+import time
+
+import sqlalchemy
+
+from src import database as db
+from src.api.decks import get_user_decks
+
+DECK_COUNTS = (1, 3, 10, 100, 1000)
+CARDS_PER_DECK = 5
+
+
+def per_deck_queries(connection: sqlalchemy.Connection, user_id: int) -> dict[str, list[str]]:
+    """The listing as it was before: one query for the decks, then one per deck."""
+    decks = connection.execute(
+        sqlalchemy.text("SELECT id, deck_name FROM decks WHERE user_id = :user_id"),
+        {"user_id": user_id}
+    ).all()
+    return {
+        deck.deck_name: connection.execute(
+            sqlalchemy.text("""
+                SELECT c.name FROM deck_cards AS dc
+                JOIN cards AS c ON c.id = dc.card_id
+                WHERE dc.deck_id = :deck_id
+                ORDER BY dc.position
+            """),
+            {"deck_id": deck.id}
+        ).scalars().all()
+        for deck in decks
+    }
+
+
+def seed_decks(connection: sqlalchemy.Connection, deck_count: int) -> int:
+    user_id = connection.execute(
+        sqlalchemy.text("INSERT INTO users (username, coins) VALUES ('bench_user_decks', 0) RETURNING id")
+    ).scalar_one()
+    card_ids = connection.execute(
+        sqlalchemy.text("SELECT id FROM cards ORDER BY id LIMIT :n"), {"n": CARDS_PER_DECK}
+    ).scalars().all()
+    connection.execute(
+        sqlalchemy.text("""
+            WITH new_decks AS (
+                INSERT INTO decks (user_id, deck_name)
+                SELECT :user_id, 'deck_' || n FROM generate_series(1, :deck_count) AS n
+                RETURNING id
+            )
+            INSERT INTO deck_cards (deck_id, card_id, position)
+            SELECT new_decks.id, card.card_id, card.position
+            FROM new_decks
+            CROSS JOIN unnest(CAST(:card_ids AS INTEGER[])) WITH ORDINALITY AS card(card_id, position)
+        """),
+        {"user_id": user_id, "deck_count": deck_count, "card_ids": card_ids}
+    )
+    return user_id
+
+
+def time_listing(label: str, list_decks, min_seconds: float = 0.5) -> float:
+    list_decks()  # warm up
+    rounds = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_seconds:
+        list_decks()
+        rounds += 1
+    elapsed_ms = (time.perf_counter() - start) / rounds * 1000
+    print(f"{label:<32} {elapsed_ms:>10.2f} ms/listing")
+    return elapsed_ms
+
+
+def main():
+    for deck_count in DECK_COUNTS:
+        with db.engine.connect() as connection:
+            transaction = connection.begin()
+            try:
+                user_id = seed_decks(connection, deck_count)
+                assert per_deck_queries(connection, user_id) == get_user_decks(user_id, connection)
+
+                print(f"\n{deck_count} deck(s)")
+                baseline = time_listing("one query per deck", lambda: per_deck_queries(connection, user_id))
+                aggregated = time_listing("single array_agg query", lambda: get_user_decks(user_id, connection))
+                print(f"{'speedup':<32} {baseline / aggregated:>10.1f}x")
+            finally:
+                transaction.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -17,8 +17,15 @@ with db.engine.begin() as connection:
         id = connection.execute(sqlalchemy.text("INSERT INTO users(username, coins) VALUES(:username, 0) RETURNING id"),{"username": name}).scalar_one()
         for card in cards:
             connection.execute(sqlalchemy.text("INSERT INTO collection(user_id, card_id, quantity) VALUES(:id, :card_id, 1)"),{"id": id,"card_id": card})
+        connection.execute(sqlalchemy.text("""
+            INSERT INTO user_pack_progress(user_id, pack_id, owned_cards)
+            SELECT col.user_id, c.pack_id, COUNT(*) FROM collection AS col
+            JOIN cards AS c ON c.id = col.card_id
+            WHERE col.user_id = :id
+            GROUP BY col.user_id, c.pack_id
+        """),{"id": id})
         
 with db.engine.begin() as connection:
     for name, cards, c_name in names_cards:
         id = connection.execute(sqlalchemy.text("SELECT id FROM users WHERE username = :username"),{"username": name}).scalar_one()
-        create_deck(id, "Default_Deck", c_name)
\ No newline at end of file
+        create_deck(id, "Default_Deck", c_name, connection)
\ No newline at end of file
@@ -10,6 +10,8 @@ with db.engine.begin() as connection:
     connection.execute(sqlalchemy.text("DELETE FROM decks"))
     connection.execute(sqlalchemy.text("DELETE FROM display"))
     connection.execute(sqlalchemy.text("DELETE FROM collection"))
+    connection.execute(sqlalchemy.text("DELETE FROM user_pack_progress"))
     connection.execute(sqlalchemy.text("DELETE FROM inventory"))
+    connection.execute(sqlalchemy.text("DELETE FROM coin_ledger"))
     connection.execute(sqlalchemy.text("DELETE FROM users"))
     print("Reset Successful")
\ No newline at end of file
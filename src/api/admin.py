@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel
+
+from src import coins
+from src.api import auth
+from src.reference_data import reload_reference_data
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(auth.get_api_key)],
+)
+
+
+class ReferenceDataVersion(BaseModel):
+    version: str
+    cards: int
+    packs: int
+
+
+class LedgerCompaction(BaseModel):
+    entries: int
+    users: int
+
+
+@router.post("/reference_data/reload", response_model=ReferenceDataVersion)
+def reload_cards_and_packs():
+    """
+    Reloads the cached cards and packs tables in this worker.
+
+    Call after running a migration that changes either table.
+
+    Returns:
+        ReferenceDataVersion: Version digest and row counts of the newly loaded data.
+    """
+    reference_data = reload_reference_data()
+    return ReferenceDataVersion(
+        version=reference_data.version,
+        cards=len(reference_data.cards),
+        packs=len(reference_data.packs),
+    )
+
+
+@router.post("/coins/compact", response_model=LedgerCompaction)
+def compact_coin_ledger():
+    """
+    Folds every unapplied coin_ledger credit into users.coins.
+
+    Only needed in ledger mode (settings.COIN_LEDGER); the app also compacts
+    periodically on its own unless COIN_LEDGER_COMPACT_INTERVAL is 0.
+
+    Returns:
+        LedgerCompaction: Number of ledger entries applied and of users credited.
+    """
+    entries, users = coins.compact()
+    return LedgerCompaction(entries=entries, users=users)
@@ -0,0 +1,92 @@
+import functools
+import inspect
+
+from fastapi import APIRouter, Depends, params
+from fastapi.routing import APIRoute
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src import database as db
+
+
+def _connection_parameter(endpoint) -> str | None:
+    """Name of the endpoint's `Depends(db.get_connection)` parameter, if it has one."""
+    for parameter in inspect.signature(endpoint).parameters.values():
+        if isinstance(parameter.default, params.Depends) and parameter.default.dependency is db.get_connection:
+            return parameter.name
+    return None
+
+
+def keep_on_threadpool(endpoint):
+    """
+    Marks a sync endpoint that async_router should leave as it is.
+
+    run_sync runs the whole endpoint body on the event loop, so an endpoint that does
+    heavy CPU work between queries would stall every other request while it runs.
+    Marked endpoints keep the sync engine and run on the threadpool in both modes.
+    """
+    endpoint._keep_on_threadpool = True
+    return endpoint
+
+
+def async_endpoint(endpoint):
+    """
+    Wraps a sync endpoint that takes `connection = Depends(db.get_connection)` into an
+    async endpoint on the async engine.
+
+    The endpoint body runs unchanged through AsyncConnection.run_sync, which hands it a
+    sync Connection facade whose I/O is awaited on the event loop, so the request never
+    occupies a threadpool thread. The wrapper keeps the endpoint's signature, apart
+    from the connection parameter, so FastAPI parses the request the same way.
+    """
+    name = _connection_parameter(endpoint)
+    signature = inspect.signature(endpoint)
+
+    @functools.wraps(endpoint)
+    async def wrapper(**kwargs):
+        connection = kwargs.pop(name)
+        return await connection.run_sync(lambda sync_connection: endpoint(**kwargs, **{name: sync_connection}))
+
+    wrapper.__signature__ = signature.replace(parameters=[
+        parameter.replace(annotation=AsyncConnection, default=Depends(db.get_async_connection))
+        if parameter.name == name else parameter
+        for parameter in signature.parameters.values()
+    ])
+    return wrapper
+
+
+def async_router(router: APIRouter) -> APIRouter:
+    """
+    Copy of `router` whose database endpoints run on the async engine (settings.ASYNC_DB).
+
+    Routes keep their paths, dependencies, response models and OpenAPI metadata.
+    Endpoints that don't take a request connection, and those marked with
+    keep_on_threadpool, are kept as they are.
+    """
+    converted = APIRouter()
+    for route in router.routes:
+        if (
+            not isinstance(route, APIRoute)
+            or _connection_parameter(route.endpoint) is None
+            or getattr(route.endpoint, "_keep_on_threadpool", False)
+        ):
+            converted.routes.append(route)
+            continue
+        converted.add_api_route(
+            route.path,
+            async_endpoint(route.endpoint),
+            methods=list(route.methods),
+            response_model=route.response_model,
+            status_code=route.status_code,
+            tags=route.tags,
+            dependencies=route.dependencies,
+            summary=route.summary,
+            description=route.description,
+            response_description=route.response_description,
+            responses=route.responses,
+            deprecated=route.deprecated,
+            operation_id=route.operation_id,
+            include_in_schema=route.include_in_schema,
+            response_class=route.response_class,
+            name=route.name,
+        )
+    return converted
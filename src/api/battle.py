@@ -1,12 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
-from typing import Optional
+import math
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import List, Optional
+import numpy as np
 import sqlalchemy
-from src.api import auth
+from src.api import auth, async_routes
 from src import database as db
-import numpy as np
-import time
-from src.api.collection import check_user_exists
+from src import coins
+from src import rng
+from src import tournament
+
+# Coins awarded for a victory
+PRIZE = 100
+# Coins awarded for each tournament match won
+TOURNAMENT_PRIZE_PER_WIN = 10
+# z-score of the two-sided 95% confidence interval reported by simulate
+Z_95 = 1.959963984540054
 
 router = APIRouter(
     prefix="/battle",
@@ -18,8 +27,71 @@ class BattleResponse(BaseModel):
     result: str
     prize: Optional[int] = 0
 
+class SimulationResponse(BaseModel):
+    battles: int
+    wins: int
+    win_prob: float
+    win_rate: float
+    win_rate_low: float
+    win_rate_high: float
+    total_prize: int
+    expected_prize: float
+
+class TournamentRequest(BaseModel):
+    deck_ids: List[int] = Field(min_length=2, description="Decks entering the tournament, from any users")
+
+class TournamentStanding(BaseModel):
+    rank: int
+    deck_id: int
+    user_id: int
+    deck_name: str
+    wins: int
+    losses: int
+    expected_wins: float
+    prize: int
+
+class TournamentResult(BaseModel):
+    matches: int
+    standings: List[TournamentStanding]
+
+def get_deck_win_prob(connection: sqlalchemy.Connection, user_id: int, deck_name: str) -> float:
+    """
+    Reads a deck's stored win probability, checking the user and deck in the same query.
+
+    Raises:
+        HTTPException 404 if the user or the deck does not exist.
+        HTTPException 400 if the deck contains no cards.
+    """
+    deck = connection.execute(
+        sqlalchemy.text("""
+            SELECT d.id, d.card_count, d.win_prob
+            FROM users AS u
+            LEFT JOIN decks AS d ON d.user_id = u.id AND LOWER(d.deck_name) = LOWER(:deck_name)
+            WHERE u.id = :user_id
+        """),
+        {"deck_name": deck_name, "user_id": user_id}
+    ).first()
+
+    if deck is None:
+        raise HTTPException(status_code=404, detail=f"User with ID {user_id} does not exist.")
+    if deck.id is None:
+        raise HTTPException(status_code=404, detail=f"User's deck {deck_name} does not exist")
+    if not deck.card_count:
+        raise HTTPException(status_code=400, detail=f"Deck {deck_name} contains no cards.")
+
+    # win_prob is computed by the database from the stats stored when the deck was created
+    return deck.win_prob
+
+def wilson_interval(wins: int, n: int, z: float = Z_95) -> tuple[float, float]:
+    """Wilson score interval for a win rate of wins out of n battles."""
+    p = wins / n
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
 @router.post("/{user_id}/battle/{deck_name}", response_model=BattleResponse)
-def battle(user_id: int, deck_name: str) -> BattleResponse:
+def battle(user_id: int, deck_name: str, connection: sqlalchemy.Connection = Depends(db.get_connection)) -> BattleResponse:
     """
     Simulate a battle using the specified user's deck.
 
@@ -34,68 +106,129 @@ def battle(user_id: int, deck_name: str) -> BattleResponse:
         HTTPException 404 if the user or the deck does not exist.
         HTTPException 400 if the deck contains no cards.
     """
-    start_time = time.time()  # Start timer
-    
-    check_user_exists(user_id)
-
-    with db.engine.begin() as connection:
-        result = connection.execute(
-            sqlalchemy.text("""
-                SELECT id FROM decks 
-                WHERE LOWER(deck_name) = LOWER(:deck_name) 
-                  AND user_id = :user_id
-            """),
-            {"deck_name": deck_name, "user_id": user_id}
-        ).fetchone()
-
-        if result is None:
-            raise HTTPException(status_code=404, detail=f"User's deck {deck_name} does not exist")
-
-        deck_id = result[0]
-
-        deck_contents = connection.execute(
-            sqlalchemy.text("""
-                SELECT d.card_name, c.price FROM deck_cards AS d
-                INNER JOIN cards AS c ON c.name = d.card_name
-                WHERE d.deck_id = :deck_id
-            """),
-            {"deck_id": deck_id}
-        ).all()
-
-    if not deck_contents:
-        raise HTTPException(status_code=400, detail=f"Deck {deck_name} contains no cards.")
+    win_prob = get_deck_win_prob(connection, user_id, deck_name)
+
+    battle_result = 'Victory!' if rng.uniform() < win_prob else 'Defeat...'
+
+    prize = 0
+    if battle_result == 'Victory!':
+        prize = PRIZE
+        coins.credit(connection, user_id, prize, "battle")
+    return BattleResponse(result=battle_result, prize=prize)
 
-    MAX_CARD_PRICE = 100
-    value_sum = 0
-    highest_value = 0
-    lowest_value = MAX_CARD_PRICE
+@router.post("/{user_id}/simulate/{deck_name}", response_model=SimulationResponse)
+def simulate_battles(
+    user_id: int,
+    deck_name: str,
+    n: int = Query(1000, ge=1, le=100_000_000, description="Number of battles to simulate"),
+    connection: sqlalchemy.Connection = Depends(db.get_connection),
+) -> SimulationResponse:
+    """
+    Simulate many battles with the specified user's deck without awarding any coins.
 
-    for _, price in deck_contents:
-        card_value = min(price, MAX_CARD_PRICE)
-        highest_value = max(highest_value, card_value)
-        lowest_value = min(lowest_value, card_value)
-        value_sum += card_value
+    The number of wins over n independent battles is drawn in a single binomial draw,
+    which has the same distribution as fighting n battles one by one, so the cost does
+    not depend on n.
 
-    avg_value = value_sum / len(deck_contents)
+    Args:
+        user_id (int): The ID of the user whose deck is simulated.
+        deck_name (str): The name of the deck to simulate.
+        n (int): Number of battles to simulate.
 
-    win_prob = 0.01 * (30 + (avg_value * 0.4) + (highest_value * 0.2) + (lowest_value * 0.1))
-    win_prob = max(0, min(1, win_prob))  # clamp to [0, 1]
+    Returns:
+        SimulationResponse: Wins, the observed win rate with its 95% Wilson interval,
+            the prize the wins would have earned and the expected prize per battle.
 
-    battle_result = np.random.choice(['Victory!', 'Defeat...'], p=[win_prob, 1 - win_prob])
+    Raises:
+        HTTPException 404 if the user or the deck does not exist.
+        HTTPException 400 if the deck contains no cards.
+    """
+    win_prob = get_deck_win_prob(connection, user_id, deck_name)
+
+    wins = int(rng.get_generator().binomial(n, win_prob))
+    win_rate_low, win_rate_high = wilson_interval(wins, n)
+
+    return SimulationResponse(
+        battles=n,
+        wins=wins,
+        win_prob=win_prob,
+        win_rate=wins / n,
+        win_rate_low=win_rate_low,
+        win_rate_high=win_rate_high,
+        total_prize=wins * PRIZE,
+        expected_prize=win_prob * PRIZE,
+    )
+
+@router.post("/tournament", response_model=TournamentResult)
+@async_routes.keep_on_threadpool
+def run_tournament(request: TournamentRequest, connection: sqlalchemy.Connection = Depends(db.get_connection)) -> TournamentResult:
+    """
+    Play a round-robin tournament between the given decks and pay out the prizes.
 
-    prize = 0
-    if battle_result == 'Victory!':
-        prize = 100
-        with db.engine.begin() as connection:
-            connection.execute(
-                sqlalchemy.text("""
-                    UPDATE users
-                    SET coins = coins + :prize
-                    WHERE id = :user_id
-                """),
-                {"prize": prize, "user_id": user_id}
-            )
-    end_time = time.time()  # End timer
-    elapsed_ms = (end_time - start_time) * 1000
-    print(f"Completed in {elapsed_ms:.2f} ms")
-    return BattleResponse(result=battle_result, prize=prize)
+    Every deck plays every other deck once. Deck i beats deck j with probability
+    p_i / (p_i + p_j), where p is each deck's stored win probability. Each win earns
+    the deck's owner TOURNAMENT_PRIZE_PER_WIN coins.
+
+    The decks are loaded with one query, all matches are drawn with vectorized NumPy
+    (see src/tournament.py) and every owner's prize is credited by one statement.
+    The matches are O(n^2) CPU work, so in async mode this endpoint stays on the
+    threadpool instead of running on the event loop.
+
+    Args:
+        request (TournamentRequest): IDs of the decks taking part.
+
+    Returns:
+        TournamentResult: Number of matches played and the standings, best first.
+
+    Raises:
+        HTTPException 400 if a deck is listed twice or contains no cards.
+        HTTPException 404 if a deck does not exist.
+    """
+    deck_ids = request.deck_ids
+    if len(set(deck_ids)) < len(deck_ids):
+        raise HTTPException(status_code=400, detail="Each deck can only enter the tournament once.")
+
+    decks = connection.execute(
+        sqlalchemy.text("""
+            SELECT id, user_id, deck_name, card_count, win_prob
+            FROM decks
+            WHERE id = ANY(CAST(:deck_ids AS INTEGER[]))
+            ORDER BY id
+        """),
+        {"deck_ids": deck_ids}
+    ).all()
+
+    missing = sorted(set(deck_ids) - {deck.id for deck in decks})
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Decks {missing} do not exist.")
+    empty = [deck.id for deck in decks if not deck.card_count]
+    if empty:
+        raise HTTPException(status_code=400, detail=f"Decks {empty} contain no cards.")
+
+    wins, expected_wins = tournament.round_robin([deck.win_prob for deck in decks])
+    losses = len(decks) - 1 - wins
+    prizes = wins * TOURNAMENT_PRIZE_PER_WIN
+
+    # A user may enter several decks; credit each user once with the total
+    user_ids, user_index = np.unique([deck.user_id for deck in decks], return_inverse=True)
+    user_prizes = np.bincount(user_index, weights=prizes).astype(np.int64)
+    paid = user_prizes > 0
+    if paid.any():
+        coins.credit_many(connection, user_ids[paid].tolist(), user_prizes[paid].tolist(), "tournament")
+
+    # Most wins first, ties broken by the stronger deck
+    order = np.lexsort((-expected_wins, -wins))
+    standings = [
+        TournamentStanding(
+            rank=rank,
+            deck_id=decks[i].id,
+            user_id=decks[i].user_id,
+            deck_name=decks[i].deck_name,
+            wins=int(wins[i]),
+            losses=int(losses[i]),
+            expected_wins=float(expected_wins[i]),
+            prize=int(prizes[i]),
+        )
+        for rank, i in enumerate(order.tolist(), start=1)
+    ]
+    return TournamentResult(matches=len(decks) * (len(decks) - 1) // 2, standings=standings)
@@ -1,8 +1,11 @@
-import time
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel, conint
-from typing import List
+from typing import List, Optional
+from src import coins
 from src import database as db
+from src.cached_responses import cached_json_response
+from src.reference_data import get_reference_data
+from src.api.collection import check_user_exists
 import sqlalchemy
 
 router = APIRouter(
@@ -13,56 +16,159 @@ router = APIRouter(
 class SellByNameRequest(BaseModel):
     quantity: conint(gt=0)  # quantity must be a positive integer
 
-def check_user_exists(user_id: int):
+class SellLine(BaseModel):
+    card_name: str
+    quantity: conint(gt=0)
+
+class SellLineResult(BaseModel):
+    card_name: str
+    quantity: int
+    sold: bool
+    coins_earned: int = 0
+    remaining_quantity: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkSellResult(BaseModel):
+    lines: List[SellLineResult]
+    coins_earned: int
+
+class DuplicateSale(BaseModel):
+    card_name: str
+    sold: int
+    remaining_quantity: int
+    coins_earned: int
+
+class SellDuplicatesSummary(BaseModel):
+    cards: List[DuplicateSale]
+    copies_sold: int
+    coins_earned: int
+
+class CardSearchResult(BaseModel):
+    name: str
+    type: str
+    price: int
+    pack: str
+    match: str
+    similarity: float
+
+def did_you_mean(card_name: str) -> str:
     """
-    Verify that a user with the given user_id exists in the database.
-    
+    " Did you mean: ...?" hint with the closest card names, or "" if nothing is close.
+    """
+    suggestions = get_reference_data().card_search.suggest(card_name)
+    return f" Did you mean: {', '.join(suggestions)}?" if suggestions else ""
+
+def remove_sold_out(connection: sqlalchemy.Connection, user_id: int, card_ids: List[int]):
+    """
+    Deletes the user's collection rows among card_ids that have reached quantity 0,
+    and lowers the user's distinct-owned count of each affected pack, in one statement.
+    """
+    connection.execute(sqlalchemy.text("""
+        WITH removed AS (
+            DELETE FROM collection
+            WHERE user_id = :user_id
+              AND card_id = ANY(CAST(:card_ids AS INTEGER[]))
+              AND quantity = 0
+            RETURNING card_id
+        ),
+        removed_per_pack AS (
+            SELECT c.pack_id, COUNT(*) AS removed_cards
+            FROM removed
+            JOIN cards AS c ON c.id = removed.card_id
+            GROUP BY c.pack_id
+        )
+        UPDATE user_pack_progress AS p
+        SET owned_cards = p.owned_cards - r.removed_cards
+        FROM removed_per_pack AS r
+        WHERE p.user_id = :user_id AND p.pack_id = r.pack_id
+    """), {"user_id": user_id, "card_ids": card_ids})
+
+def lock_collection_rows(connection: sqlalchemy.Connection, user_id: int, card_ids: Optional[List[int]]) -> dict[int, int]:
+    """
+    Locks the user's collection rows for card_ids FOR UPDATE NOWAIT, in card_id
+    order, and returns their quantities by card id. card_ids=None locks every row
+    the user has.
+
+    create_deck and add_to_display hold these rows FOR SHARE while they add a card,
+    so once the lock is taken neither can be in progress for these cards. Display
+    and deck membership must then be checked by a later statement, which under
+    READ COMMITTED sees everything they committed.
+
     Raises:
-        HTTPException 404 if user does not exist.
+        HTTPException 409 if another transaction holds one of the rows.
     """
-    with db.engine.begin() as connection:
-        existing_user = connection.execute(sqlalchemy.text("""
-            SELECT id FROM users WHERE id = :user_id
-        """), {"user_id": user_id}).scalar_one_or_none()
-        if not existing_user:
-            raise HTTPException(status_code=404, detail="User does not exist")
+    try:
+        return dict(connection.execute(sqlalchemy.text("""
+            SELECT card_id, quantity FROM collection
+            WHERE user_id = :user_id
+              AND (CAST(:card_ids AS INTEGER[]) IS NULL OR card_id = ANY(CAST(:card_ids AS INTEGER[])))
+            ORDER BY card_id
+            FOR UPDATE NOWAIT
+        """), {"user_id": user_id, "card_ids": card_ids}).all())
+    except sqlalchemy.exc.OperationalError as e:
+        if getattr(e.orig, "sqlstate", None) != db.LOCK_NOT_AVAILABLE:
+            raise
+        raise HTTPException(
+            status_code=409,
+            detail="One of these cards is being changed by another request. Please try again."
+        )
 
 @router.get("/allcards")
-def get_all_cards():
+def get_all_cards(request: Request):
     """
     Retrieve all cards along with their type, price, and the pack they belong to.
 
+    Served from the cached reference data as pre-serialized, pre-compressed JSON with
+    an ETag; a matching If-None-Match gets a 304.
+
     Returns:
         List of dictionaries, each containing card name, type, price, and pack name.
 
     Raises:
         HTTPException 404 if no cards are found in the database.
     """
-    start_time = time.time()  # Start timer
-    with db.engine.connect() as conn:
-        result = conn.execute(sqlalchemy.text("""
-            SELECT 
-                cards.name,
-                cards.type,
-                cards.price,
-                packs.name AS pack
-            FROM cards
-            JOIN packs ON cards.pack_id = packs.id
-        """)).fetchall()
-
-        if not result:
-            raise HTTPException(status_code=404, detail="No cards found")
-        end_time = time.time()  # End timer
-        elapsed_ms = (end_time - start_time) * 1000
-        print(f"Completed in {elapsed_ms:.2f} ms")
-        return [
-            {
-                "name": row.name,
-                "price": row.price,
-                "type": row.type,
-                "pack": row.pack
-            } for row in result
-        ]
+    if not get_reference_data().cards:
+        raise HTTPException(status_code=404, detail="No cards found")
+    return cached_json_response(request, "cards", lambda reference_data: [
+        {
+            "name": card.name,
+            "price": card.price,
+            "type": card.type,
+            "pack": reference_data.packs[card.pack_id].name
+        } for card in reference_data.cards.values()
+    ])
+
+@router.get("/search", response_model=List[CardSearchResult])
+def search_cards(
+    q: str = Query(..., min_length=1, description="Card name, or part of one; typos are tolerated"),
+    limit: int = Query(10, ge=1, le=100),
+):
+    """
+    Search cards by name, served from an in-memory trigram index without touching the database.
+
+    Exact matches come first, then prefix and substring matches, then names ranked by
+    trigram similarity to the query.
+
+    Args:
+        q (str): Text to search for.
+        limit (int): Most results to return.
+
+    Returns:
+        List of matching cards with their type, price, pack and how they matched.
+    """
+    reference_data = get_reference_data()
+    results = []
+    for match in reference_data.card_search.search(q, limit):
+        card = reference_data.cards[match.card_id]
+        results.append(CardSearchResult(
+            name=card.name,
+            type=card.type,
+            price=card.price,
+            pack=reference_data.packs[card.pack_id].name,
+            match=match.match,
+            similarity=match.similarity,
+        ))
+    return results
 
 @router.get("/{card_name}")
 def get_card_by_name(card_name: str):
@@ -78,38 +184,25 @@ def get_card_by_name(card_name: str):
     Raises:
         HTTPException 404 if the card is not found.
     """
-    start_time = time.time()  # Start timer
-    with db.engine.connect() as conn:
-        result = conn.execute(sqlalchemy.text("""
-            SELECT 
-                cards.name,
-                cards.type,
-                cards.price,
-                packs.name AS pack
-            FROM cards
-            JOIN packs ON cards.pack_id = packs.id
-            WHERE LOWER(cards.name) = LOWER(:card_name)
-        """), {"card_name": card_name}).fetchone()
-
-        if not result:
-            raise HTTPException(
-                status_code=404,
-                detail=(
-                    f"Card '{card_name}' not found. Check for typos or try another name."
-                )
+    reference_data = get_reference_data()
+    card = reference_data.find_card(card_name)
+
+    if not card:
+        raise HTTPException(
+            status_code=404,
+            detail=(
+                f"Card '{card_name}' not found.{did_you_mean(card_name) or ' Check for typos or try another name.'}"
             )
-        end_time = time.time()  # End timer
-        elapsed_ms = (end_time - start_time) * 1000
-        print(f"Completed in {elapsed_ms:.2f} ms")
-        return {
-            "name": result.name,
-            "price": result.price,
-            "type": result.type,
-            "pack": result.pack
-        }
+        )
+    return {
+        "name": card.name,
+        "price": card.price,
+        "type": card.type,
+        "pack": reference_data.packs[card.pack_id].name
+    }
 
 @router.post("/sell/{user_id}/{card_name}")
-def sell_card_by_name(user_id: int, card_name: str, req: SellByNameRequest):
+def sell_card_by_name(user_id: int, card_name: str, req: SellByNameRequest, connection: sqlalchemy.Connection = Depends(db.get_connection)):
     """
     Sell a specified quantity of a card by its name from the user's collection.
     
@@ -124,92 +217,334 @@ def sell_card_by_name(user_id: int, card_name: str, req: SellByNameRequest):
     Raises:
         HTTPException 404 if the user or card does not exist.
         HTTPException 400 if the card is in the user's decks or if quantity is insufficient.
+        HTTPException 409 if another request is changing the card at the same time.
     """
-    start_time = time.time()  # Start timer
-    with db.engine.begin() as conn:
-        # Verify user exists
-        check_user_exists(user_id)
+    # Verify user exists
+    check_user_exists(connection, user_id)
 
-        # Case-insensitive card lookup for id and price
-        card = conn.execute(sqlalchemy.text("""
-            SELECT id, price FROM cards WHERE LOWER(name) = LOWER(:card_name)
-        """), {"card_name": card_name}).fetchone()
+    # Case-insensitive card lookup for id and price
+    card = get_reference_data().find_card(card_name)
 
-        if not card:
-            raise HTTPException(
-                status_code=404,
-                detail=(
-                    "Card not found. Make sure the card name is correctly spelled and capitalized."
-                )
+    if not card:
+        raise HTTPException(
+            status_code=404,
+            detail=(
+                f"Card not found.{did_you_mean(card_name) or ' Make sure the card name is correctly spelled.'}"
             )
+        )
 
-        card_id = card.id
-        card_price = card.price
+    card_id = card.id
+    card_price = card.price
 
-        # Check if card is in the user's display
-        card_in_display = conn.execute(sqlalchemy.text("""
-            SELECT 1 FROM display
-            WHERE user_id = :user_id AND card_id = :card_id
-        """), {"user_id": user_id, "card_id": card_id}).fetchone()
-        
-        if card_in_display:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Cannot sell '{card_name}' because it is currently in your display. Remove it from the display before selling."
-            )
+    owned = lock_collection_rows(connection, user_id, [card_id]).get(card_id)
 
+    # Check if card is in the user's display
+    card_in_display = connection.execute(sqlalchemy.text("""
+        SELECT 1 FROM display
+        WHERE user_id = :user_id AND card_id = :card_id
+    """), {"user_id": user_id, "card_id": card_id}).fetchone()
     
-        # Check if card is in any decks owned by user (by card_id)
-        card_in_deck = conn.execute(sqlalchemy.text("""
-            SELECT d.id FROM deck_cards dc
-            JOIN decks d ON dc.deck_id = d.id
-            WHERE d.user_id = :user_id AND LOWER(dc.card_name) = LOWER(:card_name)
-        """), {"user_id": user_id, "card_name": card_name}).fetchone()
-
-        if card_in_deck:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Cannot sell '{card_name}' because it is currently in one or more of your decks. Remove it from all decks before selling."
-            )
+    if card_in_display:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot sell '{card_name}' because it is currently in your display. Remove it from the display before selling."
+        )
 
-        # Check if user owns enough quantity to sell
-        owned = conn.execute(sqlalchemy.text("""
-            SELECT quantity FROM collection
-            WHERE user_id = :user_id AND card_id = :card_id
-        """), {"user_id": user_id, "card_id": card_id}).scalar()
 
-        if not owned or owned < req.quantity:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Not enough cards to sell. You own {owned or 0} of '{card_name}'."
-            )
+    # Check if card is in any decks owned by user (by card_id)
+    card_in_deck = connection.execute(sqlalchemy.text("""
+        SELECT d.id FROM deck_cards dc
+        JOIN decks d ON dc.deck_id = d.id
+        WHERE d.user_id = :user_id AND dc.card_id = :card_id
+    """), {"user_id": user_id, "card_id": card_id}).fetchone()
 
-        # Decrease quantity or delete record if zero
-        updated_row = conn.execute(sqlalchemy.text("""
-            UPDATE collection
-            SET quantity = quantity - :qty
-            WHERE user_id = :user_id AND card_id = :card_id AND quantity >= :qty
-            RETURNING quantity
-        """), {
-            "qty": req.quantity, "user_id": user_id, "card_id": card_id
-        }).fetchone()
-
-        if updated_row.quantity == 0:
-            conn.execute(sqlalchemy.text("""
+    if card_in_deck:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot sell '{card_name}' because it is currently in one or more of your decks. Remove it from all decks before selling."
+        )
+
+    # Check if user owns enough quantity to sell
+    if not owned or owned < req.quantity:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Not enough cards to sell. You own {owned or 0} of '{card_name}'."
+        )
+
+    # Decrease quantity or delete record if zero
+    updated_row = connection.execute(sqlalchemy.text("""
+        UPDATE collection
+        SET quantity = quantity - :qty
+        WHERE user_id = :user_id AND card_id = :card_id AND quantity >= :qty
+        RETURNING quantity
+    """), {
+        "qty": req.quantity, "user_id": user_id, "card_id": card_id
+    }).fetchone()
+
+    # Last copy sold: drop the row and the user's distinct-owned count for its pack
+    if updated_row.quantity == 0:
+        connection.execute(sqlalchemy.text("""
+            WITH removed AS (
                 DELETE FROM collection
                 WHERE user_id = :user_id AND card_id = :card_id
-            """), {"user_id": user_id, "card_id": card_id})
-
-        # Add coins to user's balance
-        total_value = req.quantity * card_price
-        conn.execute(sqlalchemy.text("""
-            UPDATE users SET coins = coins + :value WHERE id = :user_id
-        """), {"value": total_value, "user_id": user_id})
-    end_time = time.time()  # End timer
-    elapsed_ms = (end_time - start_time) * 1000
-    print(f"Completed in {elapsed_ms:.2f} ms")
+                RETURNING card_id
+            )
+            UPDATE user_pack_progress
+            SET owned_cards = owned_cards - (SELECT COUNT(*) FROM removed)
+            WHERE user_id = :user_id AND pack_id = :pack_id
+        """), {"user_id": user_id, "card_id": card_id, "pack_id": card.pack_id})
+
+    # Add coins to user's balance
+    total_value = req.quantity * card_price
+    coins.credit(connection, user_id, total_value, "sell")
     return {
         "message": f"Sold {req.quantity} '{card_name}' for {total_value} coins",
         "coins_earned": total_value,
         "remaining_quantity": updated_row.quantity
     }
+
+@router.post("/sell/{user_id}", response_model=BulkSellResult)
+def sell_cards(user_id: int, lines: List[SellLine], connection: sqlalchemy.Connection = Depends(db.get_connection)):
+    """
+    Sell several cards from the user's collection at once.
+
+    Every line that can be sold is sold and the rest are reported with the reason,
+    so one bad line does not block the others. Whatever the number of lines, the
+    sale is one locking SELECT and one UPDATE of the collection, one DELETE of the
+    rows that reach zero and one coin credit; lines that fail get one extra query
+    to explain why. The rows are locked before the display and deck checks, as in
+    sell_card_by_name.
+
+    A line fails if the card does not exist, is listed twice, is in the user's
+    display or one of their decks, or the user owns fewer copies than requested.
+
+    Args:
+        user_id (int): ID of the user selling the cards.
+        lines (List[SellLine]): Cards and quantities to sell.
+
+    Returns:
+        BulkSellResult: Outcome of each line, in request order, and the total coins earned.
+
+    Raises:
+        HTTPException 404 if the user does not exist.
+        HTTPException 409 if another request is changing one of the cards at the same time.
+    """
+    reference_data = get_reference_data()
+    results = [SellLineResult(card_name=line.card_name, quantity=line.quantity, sold=False) for line in lines]
+
+    # Resolve names through the reference cache; each card may appear on one line only
+    requested = {}
+    for i, line in enumerate(lines):
+        card = reference_data.find_card(line.card_name)
+        if card is None:
+            results[i].error = f"Card not found.{did_you_mean(line.card_name)}"
+        elif card.id in requested:
+            results[i].error = "Card is listed more than once. Combine the quantities into one line."
+        else:
+            requested[card.id] = i
+
+    if not requested:
+        check_user_exists(connection, user_id)
+        return BulkSellResult(lines=results, coins_earned=0)
+
+    card_ids = list(requested.keys())
+    quantities = [lines[i].quantity for i in requested.values()]
+
+    lock_collection_rows(connection, user_id, card_ids)
+
+    # Cards in the display or in a deck can't be sold, and owned copies must cover the quantity
+    sold = dict(connection.execute(sqlalchemy.text("""
+        UPDATE collection AS col
+        SET quantity = col.quantity - req.quantity
+        FROM unnest(CAST(:card_ids AS INTEGER[]), CAST(:quantities AS INTEGER[])) AS req(card_id, quantity)
+        WHERE col.user_id = :user_id
+          AND col.card_id = req.card_id
+          AND col.quantity >= req.quantity
+          AND NOT EXISTS (
+              SELECT 1 FROM display AS d
+              WHERE d.user_id = :user_id AND d.card_id = req.card_id
+          )
+          AND NOT EXISTS (
+              SELECT 1 FROM deck_cards AS dc
+              JOIN decks AS dk ON dk.id = dc.deck_id
+              WHERE dk.user_id = :user_id AND dc.card_id = req.card_id
+          )
+        RETURNING col.card_id, col.quantity
+    """), {"user_id": user_id, "card_ids": card_ids, "quantities": quantities}).all())
+
+    unsold = [card_id for card_id in card_ids if card_id not in sold]
+    if unsold:
+        explained = connection.execute(sqlalchemy.text("""
+            SELECT req.card_id,
+                   COALESCE(col.quantity, 0) AS owned,
+                   EXISTS (
+                       SELECT 1 FROM display AS d
+                       WHERE d.user_id = :user_id AND d.card_id = req.card_id
+                   ) AS in_display,
+                   EXISTS (
+                       SELECT 1 FROM deck_cards AS dc
+                       JOIN decks AS dk ON dk.id = dc.deck_id
+                       WHERE dk.user_id = :user_id AND dc.card_id = req.card_id
+                   ) AS in_deck,
+                   EXISTS (SELECT 1 FROM users WHERE id = :user_id) AS user_exists
+            FROM unnest(CAST(:card_ids AS INTEGER[])) AS req(card_id)
+            LEFT JOIN collection AS col ON col.user_id = :user_id AND col.card_id = req.card_id
+        """), {"user_id": user_id, "card_ids": unsold}).all()
+
+        if not explained[0].user_exists:
+            raise HTTPException(status_code=404, detail=f"User with ID {user_id} does not exist.")
+
+        for row in explained:
+            result = results[requested[row.card_id]]
+            if row.in_display:
+                result.error = "Card is in your display. Remove it from the display before selling."
+            elif row.in_deck:
+                result.error = "Card is in one or more of your decks. Remove it from all decks before selling."
+            else:
+                result.error = f"Not enough cards to sell. You own {row.owned}."
+
+    if sold:
+        remove_sold_out(connection, user_id, [card_id for card_id, remaining in sold.items() if remaining == 0])
+
+    total_value = 0
+    for card_id, remaining in sold.items():
+        result = results[requested[card_id]]
+        result.sold = True
+        result.coins_earned = result.quantity * reference_data.cards[card_id].price
+        result.remaining_quantity = remaining
+        total_value += result.coins_earned
+
+    if total_value:
+        coins.credit(connection, user_id, total_value, "sell")
+
+    return BulkSellResult(lines=results, coins_earned=total_value)
+
+@router.post("/{user_id}/sell_duplicates", response_model=SellDuplicatesSummary)
+def sell_duplicates(
+    user_id: int,
+    keep: int = Query(1, ge=0, description="Copies of each card to keep"),
+    type: Optional[str] = Query(None, description="Only sell cards of this type"),
+    pack_name: Optional[str] = Query(None, description="Only sell cards from this pack"),
+    connection: sqlalchemy.Connection = Depends(db.get_connection),
+):
+    """
+    Sell every copy of the user's cards beyond the first `keep`.
+
+    Cards in the user's display or decks always keep at least one copy, even with
+    keep=0. Once the user's collection rows are locked, as in sell_card_by_name,
+    the excess of every card is computed, removed and paid for by a single
+    statement: rows left with copies are decremented, rows left empty are deleted
+    (the two sets are disjoint) and pack progress is updated, followed by one coin
+    credit for the total.
+
+    Args:
+        user_id (int): ID of the user selling the cards.
+        keep (int): Copies of each card to keep.
+        type (str, optional): Only sell cards of this type.
+        pack_name (str, optional): Only sell cards from this pack.
+
+    Returns:
+        SellDuplicatesSummary: Copies sold and coins earned per card and in total.
+
+    Raises:
+        HTTPException 400 if the card type is invalid.
+        HTTPException 404 if the user or the pack does not exist.
+        HTTPException 409 if another request is changing one of the cards at the same time.
+    """
+    reference_data = get_reference_data()
+
+    # Filters are resolved to card ids through the reference cache
+    cards = reference_data.cards.values()
+    if type is not None:
+        if type not in reference_data.types:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid card type '{type}'. Valid types are: {', '.join(sorted(reference_data.types))}."
+            )
+        cards = [card for card in cards if card.type == type]
+    if pack_name is not None:
+        pack = reference_data.find_pack(pack_name)
+        if pack is None:
+            raise HTTPException(status_code=404, detail=f"Pack '{pack_name}' does not exist.")
+        cards = [card for card in cards if card.pack_id == pack.id]
+    card_ids = [card.id for card in cards] if type is not None or pack_name is not None else None
+
+    lock_collection_rows(connection, user_id, card_ids)
+
+    rows = connection.execute(sqlalchemy.text("""
+        WITH candidates AS (
+            SELECT col.card_id,
+                   col.quantity,
+                   CASE
+                       WHEN EXISTS (
+                           SELECT 1 FROM display AS d
+                           WHERE d.user_id = :user_id AND d.card_id = col.card_id
+                       ) OR EXISTS (
+                           SELECT 1 FROM deck_cards AS dc
+                           JOIN decks AS dk ON dk.id = dc.deck_id
+                           WHERE dk.user_id = :user_id AND dc.card_id = col.card_id
+                       ) THEN GREATEST(:keep, 1)
+                       ELSE :keep
+                   END AS keep_quantity
+            FROM collection AS col
+            WHERE col.user_id = :user_id
+              AND (CAST(:card_ids AS INTEGER[]) IS NULL OR col.card_id = ANY(CAST(:card_ids AS INTEGER[])))
+            FOR UPDATE
+        ),
+        excess AS (
+            SELECT card_id, quantity - keep_quantity AS sold, keep_quantity
+            FROM candidates
+            WHERE quantity > keep_quantity
+        ),
+        decremented AS (
+            UPDATE collection AS col
+            SET quantity = col.quantity - e.sold
+            FROM excess AS e
+            WHERE col.user_id = :user_id AND col.card_id = e.card_id AND e.keep_quantity > 0
+            RETURNING col.card_id
+        ),
+        deleted AS (
+            DELETE FROM collection AS col
+            USING excess AS e
+            WHERE col.user_id = :user_id AND col.card_id = e.card_id AND e.keep_quantity = 0
+            RETURNING col.card_id
+        ),
+        progress AS (
+            UPDATE user_pack_progress AS p
+            SET owned_cards = p.owned_cards - r.removed_cards
+            FROM (
+                SELECT c.pack_id, COUNT(*) AS removed_cards
+                FROM deleted
+                JOIN cards AS c ON c.id = deleted.card_id
+                GROUP BY c.pack_id
+            ) AS r
+            WHERE p.user_id = :user_id AND p.pack_id = r.pack_id
+        )
+        SELECT u.user_exists, e.card_id, e.sold, e.keep_quantity
+        FROM (SELECT EXISTS (SELECT 1 FROM users WHERE id = :user_id) AS user_exists) AS u
+        LEFT JOIN excess AS e
+            ON e.card_id IN (SELECT card_id FROM decremented UNION ALL SELECT card_id FROM deleted)
+        ORDER BY e.card_id
+    """), {"user_id": user_id, "keep": keep, "card_ids": card_ids}).all()
+
+    if not rows[0].user_exists:
+        raise HTTPException(status_code=404, detail=f"User with ID {user_id} does not exist.")
+
+    sales = [
+        DuplicateSale(
+            card_name=reference_data.cards[row.card_id].name,
+            sold=row.sold,
+            remaining_quantity=row.keep_quantity,
+            coins_earned=row.sold * reference_data.cards[row.card_id].price,
+        )
+        for row in rows if row.card_id is not None
+    ]
+    total_value = sum(sale.coins_earned for sale in sales)
+    if total_value:
+        coins.credit(connection, user_id, total_value, "sell_duplicates")
+
+    return SellDuplicatesSummary(
+        cards=sales,
+        copies_sold=sum(sale.sold for sale in sales),
+        coins_earned=total_value,
+    )
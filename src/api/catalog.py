@@ -1,10 +1,9 @@
-import time
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from typing import List
-import sqlalchemy
 from src.api import auth
-from src import database as db
+from src.cached_responses import cached_json_response
+from src.reference_data import ReferenceData
 # from src.api.packs import Pack  # Currently commented out, using local Pack model
 
 router = APIRouter()
@@ -18,58 +17,40 @@ class Pack(BaseModel):
     name: str
     price: int
 
-def create_catalog() -> List[Pack]:
+def create_catalog(reference_data: ReferenceData) -> List[Pack]:
     """
-    Queries the database to retrieve the list of available packs,
+    Builds the list of available packs from the cached reference data,
     ordered by price descending and name ascending. Limits the catalog
     to a maximum of 6 items.
 
+    Args:
+        reference_data (ReferenceData): Cached cards and packs to build the catalog from.
+
     Returns:
         List[Pack]: A list of Pack objects representing the catalog.
     """
-    
-    catalog_list = []
-    with db.engine.begin() as connection:
-        rows = connection.execute(
-            sqlalchemy.text(
-                """
-                SELECT name, price
-                FROM packs
-                ORDER BY price DESC, name ASC
-                """
-            )
-        ).all()
+    packs = sorted(reference_data.packs.values(), key=lambda pack: (-pack.price, pack.name))
 
-    if not rows:
+    if not packs:
         # Log to console for debugging purposes
         print("No packs found in the database to populate the catalog.")
-        # Could alternatively raise an HTTPException if preferred:
-        # raise HTTPException(status_code=404, detail="No packs available in the catalog.")
-        return catalog_list
+        return []
 
     # Limit the catalog size to 6 items
-    for name, price in rows:
-        if len(catalog_list) < 6:
-            catalog_list.append(Pack(name=name, price=price))
-        else:
-            break
-    return catalog_list
+    return [Pack(name=pack.name, price=pack.price) for pack in packs[:6]]
 
 @router.get("/catalog/packs/", tags=["catalog"], response_model=List[Pack])
-def get_catalog() -> List[Pack]:
+def get_catalog(request: Request):
     """
     Endpoint to retrieve the current catalog of packs available for purchase.
-    
+
+    The response is serialized and compressed once per reference data version and
+    served with an ETag, so a matching If-None-Match gets a 304.
+
     Returns:
         List[Pack]: List of packs (up to 6), sorted by price descending then name ascending.
     """
-    start_time = time.time()  # Start timer
-    catalog = create_catalog()
-    if not catalog:
-        # Optional: raise 404 if no packs found
-        # raise HTTPException(status_code=404, detail="No packs available in the catalog.")
-        pass
-    end_time = time.time()  # End timer
-    elapsed_ms = (end_time - start_time) * 1000
-    print(f"Completed in {elapsed_ms:.2f} ms")
-    return catalog
+    return cached_json_response(
+        request, "catalog",
+        lambda reference_data: [pack.model_dump() for pack in create_catalog(reference_data)]
+    )
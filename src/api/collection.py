@@ -1,6 +1,5 @@
 from dataclasses import dataclass
-import time
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, status, HTTPException, Request
 from pydantic import BaseModel, Field, field_validator
 from typing import List
 import sqlalchemy
@@ -8,6 +7,8 @@ import sqlalchemy
 from src.api import auth
 from src import database as db
 from src.api.catalog import Card
+from src.cached_responses import cached_json_response
+from src.reference_data import get_reference_data
 
 router = APIRouter(
     prefix="/collection",
@@ -23,11 +24,12 @@ class CollectionResponse(BaseModel):
     Cards: List[CollectionInfo]
     TotalValue: float
 
-def check_user_exists(user_id: int):
+def check_user_exists(connection: sqlalchemy.Connection, user_id: int):
     """
     Check if a user with the given user_id exists in the database.
 
     Args:
+        connection (sqlalchemy.Connection): The request's connection to run the check on.
         user_id (int): The ID of the user to check.
 
     Raises:
@@ -36,38 +38,32 @@ def check_user_exists(user_id: int):
     Returns:
         bool: True if user exists.
     """
-    with db.engine.begin() as connection:
-        existing_user = connection.execute(
-            sqlalchemy.text("SELECT id FROM users WHERE id = :user_id"),
-            {"user_id": user_id}
-        ).scalar_one_or_none()
-        if not existing_user:
-            raise HTTPException(
-                status_code=404,
-                detail=f"User with ID {user_id} does not exist."
-            )
-        else:
-            return True
+    existing_user = connection.execute(
+        sqlalchemy.text("SELECT id FROM users WHERE id = :user_id"),
+        {"user_id": user_id}
+    ).scalar_one_or_none()
+    if not existing_user:
+        raise HTTPException(
+            status_code=404,
+            detail=f"User with ID {user_id} does not exist."
+        )
+    else:
+        return True
+
 @router.get("/types", tags=["collection"])
-def get_card_types():
+def get_card_types(request: Request):
     """
     Retrieve all distinct card types available in the catalog.
 
+    Served as cached, pre-compressed JSON with an ETag, like /cards/allcards.
+
     Returns:
         dict: Dictionary containing a list of distinct card types under the key "types".
     """
-    start_time = time.time()  # Start timer
-    with db.engine.begin() as connection:
-        types = connection.execute(
-            sqlalchemy.text("SELECT DISTINCT type FROM cards")
-        ).scalars().all()
-    end_time = time.time()  # End timer
-    elapsed_ms = (end_time - start_time) * 1000
-    print(f"Completed in {elapsed_ms:.2f} ms")
-    return {"types": types}
+    return cached_json_response(request, "types", lambda reference_data: {"types": sorted(reference_data.types)})
 
 @router.get("/{user_id}/value", tags=["collection"])
-def get_total_collection_value(user_id: int):
+def get_total_collection_value(user_id: int, connection: sqlalchemy.Connection = Depends(db.get_connection)):
     """
     Calculate the total estimated monetary value of a user's entire card collection.
 
@@ -80,26 +76,21 @@ def get_total_collection_value(user_id: int):
     Returns:
         dict: Dictionary with 'user_id' and 'total_value' keys.
     """
-    start_time = time.time()  # Start timer
-    check_user_exists(user_id)
-
-    with db.engine.begin() as connection:
-        result = connection.execute(
-            sqlalchemy.text("""
-                SELECT SUM(c.price * col.quantity) as total_value
-                FROM collection AS col
-                LEFT JOIN cards AS c ON col.card_id = c.id
-                WHERE col.user_id = :user_id
-            """),
-            {"user_id": user_id}
-        ).scalar()
-    end_time = time.time()  # End timer
-    elapsed_ms = (end_time - start_time) * 1000
-    print(f"Completed in {elapsed_ms:.2f} ms")
+    check_user_exists(connection, user_id)
+
+    result = connection.execute(
+        sqlalchemy.text("""
+            SELECT SUM(c.price * col.quantity) as total_value
+            FROM collection AS col
+            LEFT JOIN cards AS c ON col.card_id = c.id
+            WHERE col.user_id = :user_id
+        """),
+        {"user_id": user_id}
+    ).scalar()
     return {"user_id": user_id, "total_value": result or 0.0}
 
 @router.get("/type/{user_id}/{type}", tags=["collection"], response_model=CollectionResponse)
-def get_collection_by_type(user_id: int, type: str):
+def get_collection_by_type(user_id: int, type: str, connection: sqlalchemy.Connection = Depends(db.get_connection)):
     """
     Retrieve all cards of a specific type from a user's collection.
 
@@ -114,43 +105,36 @@ def get_collection_by_type(user_id: int, type: str):
     Returns:
         CollectionResponse: Contains a list of cards and total value of the selected type.
     """
-    start_time = time.time()  # Start timer
-    check_user_exists(user_id)
+    check_user_exists(connection, user_id)
     type = type.strip()
     total_value = 0.0
     collection = []
 
-    with db.engine.begin() as connection:
-        # Fetch all valid card types
-        valid_types = set(connection.execute(
-            sqlalchemy.text("SELECT DISTINCT type FROM cards")
-        ).scalars().all())
-
-        if type not in valid_types:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid card type '{type}'. Valid types are: {', '.join(sorted(valid_types))}."
-            )
-
-        cards = connection.execute(
-            sqlalchemy.text("""
-                SELECT c.name, c.type, c.price, col.quantity FROM collection AS col
-                LEFT JOIN cards AS c ON col.card_id = c.id
-                WHERE col.user_id = :user_id AND LOWER(c.type) = LOWER(:type)
-            """),
-            {"user_id": user_id, "type": type}
-        ).all()
-
-        for name, ctype, price, quantity in cards:
-            collection.append(CollectionInfo(Card=Card(name=name, type=ctype, price=price), Quantity=quantity))
-            total_value += price * quantity
-    end_time = time.time()  # End timer
-    elapsed_ms = (end_time - start_time) * 1000
-    print(f"Completed in {elapsed_ms:.2f} ms")
+    # Fetch all valid card types
+    valid_types = get_reference_data().types
+
+    if type not in valid_types:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid card type '{type}'. Valid types are: {', '.join(sorted(valid_types))}."
+        )
+
+    cards = connection.execute(
+        sqlalchemy.text("""
+            SELECT c.name, c.type, c.price, col.quantity FROM collection AS col
+            LEFT JOIN cards AS c ON col.card_id = c.id
+            WHERE col.user_id = :user_id AND LOWER(c.type) = LOWER(:type)
+        """),
+        {"user_id": user_id, "type": type}
+    ).all()
+
+    for name, ctype, price, quantity in cards:
+        collection.append(CollectionInfo(Card=Card(name=name, type=ctype, price=price), Quantity=quantity))
+        total_value += price * quantity
     return CollectionResponse(Cards=collection, TotalValue=total_value)
 
 @router.get("/{user_id}", tags=["collection"], response_model=CollectionResponse)
-def get_full_collection(user_id: int):
+def get_full_collection(user_id: int, connection: sqlalchemy.Connection = Depends(db.get_connection)):
     """
     Retrieve the full card collection for a user.
 
@@ -163,32 +147,27 @@ def get_full_collection(user_id: int):
     Returns:
         CollectionResponse: Contains the full list of cards and their total value.
     """
-    start_time = time.time()  # Start timer
-    check_user_exists(user_id)
+    check_user_exists(connection, user_id)
     collection = []
     total_value = 0.0
 
-    with db.engine.begin() as connection:
-        cards = connection.execute(
-            sqlalchemy.text("""
-                SELECT c.name, c.type, c.price, col.quantity FROM collection AS col
-                LEFT JOIN cards AS c ON col.card_id = c.id
-                WHERE col.user_id = :user_id
-                ORDER BY c.type
-            """),
-            {"user_id": user_id}
-        ).all()
-
-        for name, ctype, price, quantity in cards:
-            collection.append(CollectionInfo(Card=Card(name=name, type=ctype, price=price), Quantity=quantity))
-            total_value += price * quantity
-    end_time = time.time()  # End timer
-    elapsed_ms = (end_time - start_time) * 1000
-    print(f"Completed in {elapsed_ms:.2f} ms")
+    cards = connection.execute(
+        sqlalchemy.text("""
+            SELECT c.name, c.type, c.price, col.quantity FROM collection AS col
+            LEFT JOIN cards AS c ON col.card_id = c.id
+            WHERE col.user_id = :user_id
+            ORDER BY c.type
+        """),
+        {"user_id": user_id}
+    ).all()
+
+    for name, ctype, price, quantity in cards:
+        collection.append(CollectionInfo(Card=Card(name=name, type=ctype, price=price), Quantity=quantity))
+        total_value += price * quantity
     return CollectionResponse(Cards=collection, TotalValue=total_value)
 
 @router.get("/quantity/{user_id}", tags=["collection"], response_model=CollectionResponse)
-def get_full_collection_by_quantity(user_id: int):
+def get_full_collection_by_quantity(user_id: int, connection: sqlalchemy.Connection = Depends(db.get_connection)):
     """
     Retrieve the full card collection for a user.
 
@@ -201,29 +180,28 @@ def get_full_collection_by_quantity(user_id: int):
     Returns:
         CollectionResponse: Contains the full list of cards and their total value.
     """
-    check_user_exists(user_id)
+    check_user_exists(connection, user_id)
     collection = []
     total_value = 0.0
 
-    with db.engine.begin() as connection:
-        cards = connection.execute(
-            sqlalchemy.text("""
-                SELECT c.name, c.type, c.price, col.quantity FROM collection AS col
-                LEFT JOIN cards AS c ON col.card_id = c.id
-                WHERE col.user_id = :user_id
-                ORDER BY quantity desc, c.type
-            """),
-            {"user_id": user_id}
-        ).all()
-
-        for name, ctype, price, quantity in cards:
-            collection.append(CollectionInfo(Card=Card(name=name, type=ctype, price=price), Quantity=quantity))
-            total_value += price * quantity
+    cards = connection.execute(
+        sqlalchemy.text("""
+            SELECT c.name, c.type, c.price, col.quantity FROM collection AS col
+            LEFT JOIN cards AS c ON col.card_id = c.id
+            WHERE col.user_id = :user_id
+            ORDER BY quantity desc, c.type
+        """),
+        {"user_id": user_id}
+    ).all()
+
+    for name, ctype, price, quantity in cards:
+        collection.append(CollectionInfo(Card=Card(name=name, type=ctype, price=price), Quantity=quantity))
+        total_value += price * quantity
 
     return CollectionResponse(Cards=collection, TotalValue=total_value)
 
 @router.get("/pack/{pack}/{user_id}", tags=["collection"], response_model=CollectionResponse)
-def get_collection_by_pack(user_id: int, pack: str):
+def get_collection_by_pack(user_id: int, pack: str, connection: sqlalchemy.Connection = Depends(db.get_connection)):
     """
     Retrieve all cards of a specific type from a user's collection.
 
@@ -238,35 +216,31 @@ def get_collection_by_pack(user_id: int, pack: str):
     Returns:
         CollectionResponse: Contains a list of cards and total value of the selected type.
     """
-    check_user_exists(user_id)
+    check_user_exists(connection, user_id)
     total_value = 0.0
     collection = []
 
-    with db.engine.begin() as connection:
-        # Fetch all valid cards from the specified pack
-        valid_packs = set(connection.execute(
-            sqlalchemy.text("SELECT DISTINCT name FROM packs")
-        ).scalars().all())
-        print(f"{valid_packs}")
-        if pack not in valid_packs:
-            raise HTTPException(
-                status_code=401,
-                detail=f"Invalid pack '{pack}'. Valid packs are: {', '.join(sorted(valid_packs))}."
-            )
-        
-        # Fetch cards from the user's collection that match the specified pack
-        cards = connection.execute(
-            sqlalchemy.text("""
-                SELECT c.name, c.type, c.price, col.quantity FROM collection AS col
-                LEFT JOIN cards AS c ON col.card_id = c.id
-                INNER JOIN packs AS p ON c.pack_id = p.id
-                WHERE col.user_id = :user_id AND LOWER(p.name) = LOWER(:pack)
-            """),
-            {"user_id": user_id, "pack": pack}
-        ).all()
-
-        for name, type, price, quantity in cards:
-            collection.append(CollectionInfo(Card=Card(name=name, type=type, price=price), Quantity=quantity))
-            total_value += price * quantity
+    # Fetch all valid cards from the specified pack
+    valid_packs = {pack.name for pack in get_reference_data().packs.values()}
+    if pack not in valid_packs:
+        raise HTTPException(
+            status_code=401,
+            detail=f"Invalid pack '{pack}'. Valid packs are: {', '.join(sorted(valid_packs))}."
+        )
+    
+    # Fetch cards from the user's collection that match the specified pack
+    cards = connection.execute(
+        sqlalchemy.text("""
+            SELECT c.name, c.type, c.price, col.quantity FROM collection AS col
+            LEFT JOIN cards AS c ON col.card_id = c.id
+            INNER JOIN packs AS p ON c.pack_id = p.id
+            WHERE col.user_id = :user_id AND LOWER(p.name) = LOWER(:pack)
+        """),
+        {"user_id": user_id, "pack": pack}
+    ).all()
+
+    for name, type, price, quantity in cards:
+        collection.append(CollectionInfo(Card=Card(name=name, type=type, price=price), Quantity=quantity))
+        total_value += price * quantity
 
     return CollectionResponse(Cards=collection, TotalValue=total_value)
\ No newline at end of file
@@ -1,5 +1,4 @@
 from dataclasses import dataclass
-import time
 from fastapi import APIRouter, Depends, status, HTTPException
 from pydantic import BaseModel, Field, field_validator
 from typing import List
@@ -7,7 +6,14 @@ import sqlalchemy
 from src.api import auth
 from src import database as db
 from src.api.catalog import Card, Pack
-from src.api.collection import check_user_exists
+from src.reference_data import get_reference_data
+
+# Most decks a single user may have
+MAX_DECKS = 3
+# Card prices count toward a deck's battle strength up to this value
+MAX_CARD_PRICE = 100
+# First key of the per-user advisory lock taken while creating a deck (display uses 1)
+DECK_LOCK_KEY = 2
 
 router = APIRouter(
     prefix="/decks",
@@ -28,212 +34,223 @@ class Deck(BaseModel):
             raise ValueError("Deck name cannot be empty")
         return value
 
+def deck_error(status_code: int, code: str, message: str, **details) -> HTTPException:
+    """
+    Builds an HTTPException whose detail is a structured error, e.g.
+    {"code": "cards_not_owned", "message": "...", "cards": ["Muk"]}.
+    """
+    return HTTPException(status_code=status_code, detail={"code": code, "message": message, **details})
+
+
 @router.post("/{user_id}/create_deck/{deck_name}")
-def create_deck(user_id: int, deck_name: str, cards: List[str]):
+def create_deck(user_id: int, deck_name: str, cards: List[str], connection: sqlalchemy.Connection = Depends(db.get_connection)):
     """
     Create a new deck for a specified user.
 
     Validation rules:
-    - Exactly 5 cards must be included.
+    - Exactly 5 distinct cards must be included.
     - All cards must exist in the card database.
+    - The user must own every card in their collection.
     - The deck name must be unique per user.
+    - The user may have at most MAX_DECKS decks.
     - The user must exist.
 
+    Card names are checked against the cached reference data; everything else is
+    checked and the deck and its cards are inserted by a single statement. Creates
+    for the same user run one at a time, so the name and MAX_DECKS checks count
+    every deck a concurrent create committed. The
+    user's collection rows for the cards are locked FOR SHARE NOWAIT while the deck
+    is created. The sell endpoints lock the same rows FOR UPDATE NOWAIT before they
+    check deck membership in a later statement, so whichever transaction locks
+    first wins and the other gets a 409: a concurrent sale cannot leave a deck
+    holding a card the user no longer owns (docs/concurrency.md, Case 3).
+
     Args:
         user_id (int): ID of the user creating the deck.
         deck_name (str): Name of the new deck.
         cards (List[str]): List of exactly 5 card names to include.
 
     Raises:
-        HTTPException 400: If deck size is not 5, deck name exists, or cards don't exist.
+        HTTPException 400: If deck size is not 5, deck name exists, the deck cap is reached,
+            or cards don't exist or aren't owned.
         HTTPException 404: If user does not exist.
+        HTTPException 408: If the same card is listed more than once.
+        HTTPException 409: If one of the cards is being sold or changed at the same time.
 
     Returns:
         dict: Success message on deck creation.
     """
-    start_time = time.time()  # Start timer
-    with db.engine.begin() as connection:
-        # Validate exact deck size
-        if len(cards) != 5:
-            raise HTTPException(status_code=400, detail="A deck must contain exactly 5 cards.")
+    # Validate exact deck size
+    if len(cards) != 5:
+        raise deck_error(400, "invalid_deck_size", "A deck must contain exactly 5 cards.")
+
+    # Verify all cards exist in the card database
+    reference_data = get_reference_data()
+    found_cards = {card: reference_data.find_card(card) for card in cards}
+
+    invalid_cards = [card for card, found in found_cards.items() if found is None]
+    if invalid_cards:
+        raise deck_error(
+            400, "unknown_cards",
+            f"The following cards do not exist: {', '.join(invalid_cards)}.",
+            cards=invalid_cards
+        )
+    deck_cards = [found_cards[card] for card in cards]
+    # Check if there are any duplicate cards in the requested cards
+    if len({card.id for card in deck_cards}) < len(deck_cards):
+        raise deck_error(408, "duplicate_cards", "Deck cannot contain duplicate cards.")
 
-        # Confirm user exists
-        check_user_exists(user_id)
+    # Battle stats are stored with the deck; its win_prob column is derived from them
+    card_values = [min(card.price, MAX_CARD_PRICE) for card in deck_cards]
 
-        # Check if the deck name is already taken for this user
-        existing_deck = connection.execute(
-            sqlalchemy.text("""
-                SELECT COUNT(*) FROM decks
-                WHERE user_id = :user_id AND deck_name = :deck_name
-            """),
-            {"user_id": user_id, "deck_name": deck_name}
-        ).scalar()
-
-        if existing_deck:
-            raise HTTPException(
-                status_code=400,
-                detail=f"A deck named '{deck_name}' already exists for this user."
-            )
-        
-        # Get all decks for the user
-        decks = connection.execute(
-            sqlalchemy.text("""
-                SELECT id, deck_name FROM decks
-                WHERE user_id = :user_id
-            """),
-            {"user_id": user_id}
-        ).mappings().all()
-
-        if len(decks) > 3:
-            raise HTTPException(
-                status_code=400,
-                detail=f"User has too many decks (maximum allowed is 3). Decks are {decks}"
-            )
-
-        # Verify all cards exist in the card database
-        placeholders = ", ".join([f":card_{i}" for i in range(len(cards))])
-        params = {f"card_{i}": card for i, card in enumerate(cards)}
-
-        query = f"""
-            SELECT name FROM cards
-            WHERE name IN ({placeholders})
-        """
-        result = connection.execute(sqlalchemy.text(query), params)
-        existing_cards = result.scalars().all()
-
-        invalid_cards = [card for card in cards if card not in existing_cards]
-        if invalid_cards:
-            raise HTTPException(
-                status_code=400,
-                detail=f"The following cards do not exist: {', '.join(invalid_cards)}."
-            )
-        # Check if there are any duplicate cards in the requested cards
-        if len(set(cards)) < len(cards):
-            raise HTTPException(
-                status_code=408,
-                detail="Deck cannot contain duplicate cards."
-            )
-        
-        # Insert the new deck
-        deck_id_row = connection.execute(
+    connection.execute(
+        sqlalchemy.text("SELECT pg_advisory_xact_lock(:lock_key, :user_id)"),
+        {"lock_key": DECK_LOCK_KEY, "user_id": user_id}
+    )
+
+    try:
+        result = connection.execute(
             sqlalchemy.text("""
-                INSERT INTO decks (user_id, deck_name)
-                VALUES (:user_id, :deck_name)
-                RETURNING id
+                WITH existing AS (
+                    SELECT COUNT(*) AS deck_count,
+                           COUNT(*) FILTER (WHERE deck_name = :deck_name) AS name_taken
+                    FROM decks
+                    WHERE user_id = :user_id
+                ),
+                owned AS (
+                    SELECT card_id FROM collection
+                    WHERE user_id = :user_id
+                      AND card_id = ANY(CAST(:card_ids AS INTEGER[]))
+                      AND quantity > 0
+                    FOR SHARE NOWAIT
+                ),
+                checks AS (
+                    SELECT EXISTS (SELECT 1 FROM users WHERE id = :user_id) AS user_exists,
+                           existing.name_taken = 0 AS name_free,
+                           existing.deck_count < :max_decks AS under_cap,
+                           COALESCE((SELECT array_agg(card_id) FROM owned), '{}') AS owned_card_ids
+                    FROM existing
+                ),
+                new_deck AS (
+                    INSERT INTO decks (user_id, deck_name, card_count, value_sum, highest_value, lowest_value)
+                    SELECT :user_id, :deck_name, :card_count, :value_sum, :highest_value, :lowest_value
+                    FROM checks
+                    WHERE user_exists AND name_free AND under_cap
+                      AND cardinality(owned_card_ids) = cardinality(CAST(:card_ids AS INTEGER[]))
+                    RETURNING id
+                ),
+                new_deck_cards AS (
+                    INSERT INTO deck_cards (deck_id, card_id, position)
+                    SELECT new_deck.id, card.card_id, card.position
+                    FROM new_deck
+                    CROSS JOIN unnest(CAST(:card_ids AS INTEGER[])) WITH ORDINALITY AS card(card_id, position)
+                )
+                SELECT checks.*, (SELECT id FROM new_deck) AS deck_id
+                FROM checks
             """),
-            {"user_id": user_id, "deck_name": deck_name}
-        ).first()
-
-        deck_id = deck_id_row.id
-
-        # Associate each card with the new deck
-        for card in cards:
-            connection.execute(
-                sqlalchemy.text("""
-                    INSERT INTO deck_cards (deck_id, card_name)
-                    VALUES (:deck_id, :card_name)
-                """),
-                {"deck_id": deck_id, "card_name": card}
-            )
-        end_time = time.time()  # End timer
-        elapsed_ms = (end_time - start_time) * 1000
-        print(f"Completed in {elapsed_ms:.2f} ms")
+            {
+                "user_id": user_id,
+                "deck_name": deck_name,
+                "max_decks": MAX_DECKS,
+                "card_ids": [card.id for card in deck_cards],
+                "card_count": len(card_values),
+                "value_sum": sum(card_values),
+                "highest_value": max(card_values),
+                "lowest_value": min(card_values),
+            }
+        ).one()
+    except sqlalchemy.exc.OperationalError as e:
+        if getattr(e.orig, "sqlstate", None) != db.LOCK_NOT_AVAILABLE:
+            raise
+        raise deck_error(
+            409, "cards_busy",
+            "One of these cards is being sold or changed right now. Please try again."
+        )
+    except sqlalchemy.exc.IntegrityError as e:
+        # Backstop for inserts that don't take the lock; the name check above covers the rest
+        if getattr(e.orig, "sqlstate", None) != db.UNIQUE_VIOLATION:
+            raise
+        raise deck_error(400, "deck_name_taken", f"A deck named '{deck_name}' already exists for this user.")
+
+    if result.deck_id is not None:
         return {"message": "Deck created successfully."}
 
+    if not result.user_exists:
+        raise deck_error(404, "user_not_found", f"User with ID {user_id} does not exist.")
+    if not result.name_free:
+        raise deck_error(400, "deck_name_taken", f"A deck named '{deck_name}' already exists for this user.")
+    if not result.under_cap:
+        raise deck_error(400, "too_many_decks", f"User has too many decks (maximum allowed is {MAX_DECKS}).")
+
+    owned_card_ids = set(result.owned_card_ids)
+    not_owned = [card.name for card in deck_cards if card.id not in owned_card_ids]
+    raise deck_error(
+        400, "cards_not_owned",
+        f"The following cards are not in your collection: {', '.join(not_owned)}.",
+        cards=not_owned
+    )
+
 @router.get("/{user_id}/decks")
-def get_user_decks(user_id: int):
+def get_user_decks(user_id: int, connection: sqlalchemy.Connection = Depends(db.get_connection)):
     """
-    Retrieve all deck names created by a user.
+    Retrieve all decks created by a user along with their cards.
+
+    The user check, the decks and their cards come back from one query, so the
+    number of round trips does not grow with the number of decks.
 
     Args:
         user_id (int): The user's ID.
 
     Raises:
-        HTTPException 404: If user does not exist, no decks found, or user has more than 3 decks.
+        HTTPException 404: If user does not exist or no decks found.
 
     Returns:
-        List[str]: List of deck names owned by the user.
+        Dict[str, List[str]]: Card names of each deck, in the order the deck was created with, keyed by deck name.
     """
-    start_time = time.time()  # Start timer
-    with db.engine.begin() as connection:
-        # Check user existence
-        check_user_exists(user_id)
+    rows = connection.execute(
+        sqlalchemy.text("""
+            SELECT d.deck_name,
+                   COALESCE(array_agg(dc.card_id ORDER BY dc.position) FILTER (WHERE dc.card_id IS NOT NULL), '{}') AS card_ids
+            FROM users AS u
+            LEFT JOIN decks AS d ON d.user_id = u.id
+            LEFT JOIN deck_cards AS dc ON dc.deck_id = d.id
+            WHERE u.id = :user_id
+            GROUP BY d.id, d.deck_name
+            ORDER BY d.id
+        """),
+        {"user_id": user_id}
+    ).all()
+
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"User with ID {user_id} does not exist.")
+
+    if rows[0].deck_name is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No decks found for user with ID {user_id}."
+        )
+
+    cards = get_reference_data().cards
+    return {
+        row.deck_name: [cards[card_id].name for card_id in row.card_ids]
+        for row in rows
+    }
 
-        # Get all decks for the user
-        decks = connection.execute(
-            sqlalchemy.text("""
-                SELECT id, deck_name FROM decks
-                WHERE user_id = :user_id
-            """),
-            {"user_id": user_id}
-        ).mappings().all()
-
-        if not decks:
-            raise HTTPException(
-                status_code=404,
-                detail=f"No decks found for user with ID {user_id}."
-            )
-
-        if len(decks) > 3:
-            raise HTTPException(
-                status_code=400,
-                detail=f"User has too many decks (maximum allowed is 3). Decks are {decks}"
-            )
-
-        # Get cards for each deck
-        result = {}
-        for deck in decks:
-            deck_id = deck["id"]
-            deck_name = deck["deck_name"]
-
-            cards = connection.execute(
-                sqlalchemy.text("""
-                    SELECT card_name FROM deck_cards
-                    WHERE deck_id = :deck_id
-                """),
-                {"deck_id": deck_id}
-            ).scalars().all()
-
-            result[deck_name] = cards
-
-        end_time = time.time()  # End timer
-        elapsed_ms = (end_time - start_time) * 1000
-        print(f"Completed in {elapsed_ms:.2f} ms")
-
-        return result
-    
 @router.delete("/{user_id}/decks/{deck_name}")
-def delete_deck(user_id: int, deck_name: str):
+def delete_deck(user_id: int, deck_name: str, connection: sqlalchemy.Connection = Depends(db.get_connection)):
     """
-    Delete a specific deck for a user.
+    Delete a specific deck for a user. Its deck_cards rows go with it through ON DELETE CASCADE.
     """
-    with db.engine.begin() as connection:
-        # Confirm deck exists
-        deck = connection.execute(
-            sqlalchemy.text("""
-                SELECT id FROM decks
-                WHERE user_id = :user_id AND deck_name = :deck_name
-            """),
-            {"user_id": user_id, "deck_name": deck_name}
-        ).first()
-
-        if not deck:
-            raise HTTPException(status_code=404, detail="Deck not found.")
-
-        # Delete the deck cards first (if you have a deck_cards table)
-        connection.execute(
-            sqlalchemy.text("""
-                DELETE FROM deck_cards WHERE deck_id = :deck_id
-            """),
-            {"deck_id": deck.id}
-        )
-
-        # Delete the deck itself
-        connection.execute(
-            sqlalchemy.text("""
-                DELETE FROM decks WHERE id = :deck_id
-            """),
-            {"deck_id": deck.id}
-        )
+    deleted = connection.execute(
+        sqlalchemy.text("""
+            DELETE FROM decks
+            WHERE user_id = :user_id AND deck_name = :deck_name
+            RETURNING id
+        """),
+        {"user_id": user_id, "deck_name": deck_name}
+    ).first()
+
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Deck not found.")
 
     return {"message": f"Deck '{deck_name}' deleted successfully."}
@@ -1,5 +1,4 @@
 from dataclasses import dataclass
-import time
 from fastapi import APIRouter, Depends, status, HTTPException
 from pydantic import BaseModel, Field, field_validator
 from typing import List
@@ -8,7 +7,12 @@ import sqlalchemy
 from src.api import auth
 from src import database as db
 from src.api.catalog import Card
-from src.api.collection import check_user_exists
+from src.reference_data import get_reference_data
+
+# Most cards a user's display can hold
+MAX_DISPLAY_CARDS = 4
+# First key of the per-user advisory lock taken while adding to a display (decks uses 2)
+DISPLAY_LOCK_KEY = 1
 
 router = APIRouter(
     prefix="/display",
@@ -17,7 +21,7 @@ router = APIRouter(
 )
 
 @router.post("/{user_id}/display/add/{card_name}", tags=["display"], status_code=status.HTTP_204_NO_CONTENT)
-def add_to_display(user_id: int, card_name: str):
+def add_to_display(user_id: int, card_name: str, connection: sqlalchemy.Connection = Depends(db.get_connection)):
     """
     Add a card to a user's display, if possible.
 
@@ -29,117 +33,123 @@ def add_to_display(user_id: int, card_name: str):
         card_name (str): The name of the card to add to the display.
 
     Raises:
-        HTTPException 404: If the card is not found in the user's collection.
+        HTTPException 404: If the user does not exist or the card is not found in the user's collection.
         HTTPException 403: If the user's display already contains 4 cards.
         HTTPException 403: If the card is already present in the user's display.
     """
-    start_time = time.time()  # Start timer
-    # Verify the user exists
-    check_user_exists(user_id)
-
-    with db.engine.begin() as connection:
-        #check if card exists
-        card_id_obj = connection.execute(
-            sqlalchemy.text("SELECT id FROM cards WHERE name = :card_name"),
-            {"card_name": card_name}
-        ).fetchone()
-
-        if card_id_obj is None:
-            raise HTTPException(
-                status_code=404,
-                detail=f"'{card_name}' is not a valid card."
-            )
-        card_id = card_id_obj[0]
-
-        # Check if the card is in user's collection
-        in_collection = connection.execute(
-            sqlalchemy.text(
-                """
-                SELECT * FROM collection
-                WHERE card_id = :card_id AND user_id = :user_id
-                """
+    #check if card exists
+    card = get_reference_data().find_card(card_name)
+
+    if card is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"'{card_name}' is not a valid card."
+        )
+
+    # Adds to the same display run one at a time, so the cap check below counts every
+    # card a concurrent add committed. An advisory lock rather than the users row, which
+    # a sale holding the collection row may still need to update for its coins.
+    connection.execute(
+        sqlalchemy.text("SELECT pg_advisory_xact_lock(:lock_key, :user_id)"),
+        {"lock_key": DISPLAY_LOCK_KEY, "user_id": user_id}
+    )
+
+    # Ownership, the cap and uniqueness are checked by the same statement that inserts,
+    # and the collection row is share-locked so the card cannot be sold in between
+    result = connection.execute(
+        sqlalchemy.text(
+            """
+            WITH owned AS (
+                SELECT card_id FROM collection
+                WHERE user_id = :user_id AND card_id = :card_id AND quantity > 0
+                FOR SHARE
             ),
-            {"card_id": card_id, "user_id": user_id}
-        ).all()
-
-        # Retrieve the current cards in user's display
-        current_display = [
-            row[0] for row in connection.execute(
-                sqlalchemy.text(
-                    """
-                    SELECT c.name FROM cards AS c 
-                    INNER JOIN display AS d ON d.card_id = c.id
-                    WHERE d.user_id = :user_id
-                    """
-                ),
-                {"user_id": user_id}
-            ).all()
-        ]
+            shown AS (
+                SELECT card_id FROM display
+                WHERE user_id = :user_id
+            ),
+            inserted AS (
+                INSERT INTO display (user_id, card_id)
+                SELECT :user_id, :card_id
+                WHERE EXISTS (SELECT 1 FROM owned)
+                  AND (SELECT COUNT(*) FROM shown) < :max_cards
+                ON CONFLICT (user_id, card_id) DO NOTHING
+                RETURNING card_id
+            )
+            SELECT EXISTS (SELECT 1 FROM users WHERE id = :user_id) AS user_exists,
+                   EXISTS (SELECT 1 FROM owned) AS owned,
+                   (SELECT COUNT(*) FROM shown) AS shown_cards,
+                   EXISTS (SELECT 1 FROM inserted) AS added
+            """
+        ),
+        {"user_id": user_id, "card_id": card.id, "max_cards": MAX_DISPLAY_CARDS}
+    ).one()
+
+    if result.added:
+        return
+
+    if not result.user_exists:
+        raise HTTPException(status_code=404, detail=f"User with ID {user_id} does not exist.")
 
     # Validate presence of the card in the collection
-    if len(in_collection) == 0:
+    if not result.owned:
         raise HTTPException(
             status_code=404,
             detail=f"Card '{card_name}' is not present in user {user_id}'s collection."
         )
 
     # Check if display is full
-    if len(current_display) >= 4:
-        raise HTTPException(
-            status_code=403,
-            detail=f"User {user_id}'s display is full (maximum 4 cards allowed)."
-        )
-
-    # Check if card already in display
-    if card_name in current_display:
+    if result.shown_cards >= MAX_DISPLAY_CARDS:
         raise HTTPException(
             status_code=403,
-            detail=f"Card '{card_name}' is already in user {user_id}'s display."
+            detail=f"User {user_id}'s display is full (maximum {MAX_DISPLAY_CARDS} cards allowed)."
         )
 
-    # Insert the card into the user's display
-    with db.engine.begin() as connection:
-        connection.execute(
-            sqlalchemy.text(
-                """
-                INSERT INTO display (user_id, card_id) VALUES (:user_id, :card_id)
-                """
-            ),
-            {"user_id": user_id, "card_id": card_id}
-        )
-    end_time = time.time()  # End timer
-    elapsed_ms = (end_time - start_time) * 1000
-    print(f"Completed in {elapsed_ms:.2f} ms")
+    # Owned and room left, so the insert hit the (user_id, card_id) key
+    raise HTTPException(
+        status_code=403,
+        detail=f"Card '{card_name}' is already in user {user_id}'s display."
+    )
 
 @router.post("/{user_id}/display/remove/{card_name}", tags=["display"], status_code=status.HTTP_204_NO_CONTENT)
-def remove_from_display(user_id: int, card_name: str):
-    start_time = time.time()  # Start timer
-    # Verify the user exists
-    check_user_exists(user_id)
-
-    with db.engine.begin() as connection:
-        # Check if the card exists
-        card_id_obj = connection.execute(
-            sqlalchemy.text("SELECT id FROM cards WHERE name = :card_name"),
-            {"card_name": card_name}
-        ).fetchone()
-
-        if card_id_obj is None:
-            raise HTTPException(
-                status_code=404,
-                detail=f"'{card_name}' is not a valid card."
-            )
-        card_id = card_id_obj[0]
+def remove_from_display(user_id: int, card_name: str, connection: sqlalchemy.Connection = Depends(db.get_connection)):
+    """
+    Remove a card from a user's display.
+
+    Args:
+        user_id (int): The ID of the user.
+        card_name (str): The name of the card to remove from the display.
+
+    Raises:
+        HTTPException 404: If the user or card does not exist, or the card is not in the user's display.
+    """
+    # Check if the card exists
+    card = get_reference_data().find_card(card_name)
 
-        connection.execute(
-            sqlalchemy.text(
-                """
+    if card is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"'{card_name}' is not a valid card."
+        )
+
+    result = connection.execute(
+        sqlalchemy.text(
+            """
+            WITH removed AS (
                 DELETE FROM display WHERE user_id = :user_id AND card_id = :card_id
-                """
-            ),
-            {"user_id": user_id, "card_id": card_id}
+                RETURNING card_id
+            )
+            SELECT EXISTS (SELECT 1 FROM users WHERE id = :user_id) AS user_exists,
+                   EXISTS (SELECT 1 FROM removed) AS removed
+            """
+        ),
+        {"user_id": user_id, "card_id": card.id}
+    ).one()
+
+    if not result.user_exists:
+        raise HTTPException(status_code=404, detail=f"User with ID {user_id} does not exist.")
+    if not result.removed:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Card '{card_name}' is not in user {user_id}'s display."
         )
-    
-    end_time = time.time()  # End timer
-    elapsed_ms = (end_time - start_time) * 1000
-    print(f"Completed in {elapsed_ms:.2f} ms")
@@ -2,8 +2,8 @@ from fastapi import APIRouter, Depends, status, HTTPException
 from pydantic import BaseModel, Field
 from typing import List
 import sqlalchemy
-import time
 from src.api import auth
+from src import coins
 from src import database as db
 
 router = APIRouter(
@@ -12,25 +12,6 @@ router = APIRouter(
     dependencies=[Depends(auth.get_api_key)],
 )
 
-def check_user_exists(user_id: int):
-    """
-    Verify that a user with the given user_id exists in the database.
-
-    Raises:
-        HTTPException (404): If no user with the specified ID is found.
-    """
-    with db.engine.begin() as connection:
-        existing_user = connection.execute(
-            sqlalchemy.text("SELECT id FROM users WHERE id = :user_id"),
-            {"user_id": user_id}
-        ).scalar_one_or_none()
-
-        if not existing_user:
-            raise HTTPException(
-                status_code=404,
-                detail=f"User with ID {user_id} does not exist."
-            )
-
 class Pack(BaseModel):
     name: str = Field(..., description="Name of the pack")
     price: int = Field(..., description="Price of the pack in coins")
@@ -44,7 +25,7 @@ class InventoryAudit(BaseModel):
     packs: List[PackWithQuantity] = Field(..., description="List of unopened packs with quantities")
 
 @router.get("/{user_id}/audit", tags=["inventory"], response_model=InventoryAudit)
-def get_inventory(user_id: int) -> InventoryAudit:
+def get_inventory(user_id: int, connection: sqlalchemy.Connection = Depends(db.get_connection)) -> InventoryAudit:
     """
     Retrieve the inventory audit for a specified user.
 
@@ -60,36 +41,31 @@ def get_inventory(user_id: int) -> InventoryAudit:
     Raises:
         HTTPException (404): If the user with the given ID does not exist.
     """
-    start_time = time.time()  # Start timer
-    with db.engine.begin() as connection:
-        # Validate that the user exists
-        check_user_exists(user_id)
+    # Fetch user's coin balance, which also validates that the user exists
+    balance = coins.get_balance(connection, user_id)
 
-        # Fetch user's coin balance
-        coins = connection.execute(
-            sqlalchemy.text("SELECT coins FROM users WHERE id = :user_id"),
-            {"user_id": user_id}
-        ).scalar()
+    if balance is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"User with ID {user_id} does not exist."
+        )
 
-        # Fetch unopened packs owned by the user with quantity > 0
-        owned_packs = connection.execute(
-            sqlalchemy.text("""
-                SELECT p.name AS name, p.price AS price, i.quantity AS quantity
-                FROM inventory AS i
-                JOIN packs AS p ON p.id = i.pack_id
-                WHERE i.user_id = :user_id AND i.quantity > 0
-            """),
-            {"user_id": user_id}
-        ).mappings()
+    # Fetch unopened packs owned by the user with quantity > 0
+    owned_packs = connection.execute(
+        sqlalchemy.text("""
+            SELECT p.name AS name, p.price AS price, i.quantity AS quantity
+            FROM inventory AS i
+            JOIN packs AS p ON p.id = i.pack_id
+            WHERE i.user_id = :user_id AND i.quantity > 0
+        """),
+        {"user_id": user_id}
+    ).mappings()
 
-        pack_inventory = [
-            PackWithQuantity(
-                pack=Pack(name=row["name"], price=row["price"]),
-                quantity=row["quantity"]
-            )
-            for row in owned_packs
-        ]
-    end_time = time.time()  # End timer
-    elapsed_ms = (end_time - start_time) * 1000
-    print(f"Inventory audit for user {user_id} completed in {elapsed_ms:.2f} ms")
-    return InventoryAudit(coins=coins, packs=pack_inventory)
+    pack_inventory = [
+        PackWithQuantity(
+            pack=Pack(name=row["name"], price=row["price"]),
+            quantity=row["quantity"]
+        )
+        for row in owned_packs
+    ]
+    return InventoryAudit(coins=balance, packs=pack_inventory)
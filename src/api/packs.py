@@ -1,14 +1,20 @@
 from dataclasses import dataclass
-import time
 from fastapi import APIRouter, Depends, status, Path, HTTPException
-from pydantic import BaseModel
-from typing import List
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, conint
+from typing import List, Mapping
 import sqlalchemy
-import random
+import bisect
+import itertools
 import math
+import json
+from collections import Counter
 
 from src.api import auth
+from src import coins
 from src import database as db
+from src import rng
+from src.reference_data import get_reference_data
 from src.api.catalog import Pack
 from src.api.collection import check_user_exists
 
@@ -26,6 +32,19 @@ class Checkout(BaseModel):
     total_spent: int
 
 
+class CartLine(BaseModel):
+    """Model for one line of a multi-pack cart."""
+    pack_name: str
+    quantity: conint(gt=0)
+
+
+class CartCheckout(BaseModel):
+    """Model for representing the result of a multi-pack cart purchase."""
+    lines: List[Checkout]
+    total_spent: int
+    remaining_coins: int
+
+
 class PackOpened(BaseModel):
     """Model for a single opened pack and the cards it contains."""
     name: str
@@ -50,20 +69,20 @@ def weighted_random_choice(item_list):
     Selects an item from the list with a bias toward lower-priced items.
 
     Args:
-        item_list (List[Tuple[str, int]]): List of (name, price) tuples.
+        item_list (List[Tuple[Any, int]]): List of (key, price) tuples, e.g. card name or id.
 
     Returns:
-        str: The name of the selected item.
+        Any: The key of the selected item.
     """
     max_price = max(price for _, price in item_list)
-    weights = [math.sqrt(max_price - price + 1) for _, price in item_list]
+    cum_weights = list(itertools.accumulate(math.sqrt(max_price - price + 1) for _, price in item_list))
     names = [name for name, _ in item_list]
-    return random.choices(names, weights=weights, k=1)[0]
+    return names[bisect.bisect(cum_weights, rng.uniform() * cum_weights[-1], 0, len(names) - 1)]
 
 
 def check_pack_exists(pack_name: str):
     """
-    Ensures a pack with the given name exists in the database.
+    Ensures a pack with the given name exists in the reference data.
 
     Args:
         pack_name (str): Name of the pack.
@@ -74,64 +93,194 @@ def check_pack_exists(pack_name: str):
     Raises:
         HTTPException: If the pack is not found.
     """
-    with db.engine.begin() as connection:
-        pack = connection.execute(
-            sqlalchemy.text("SELECT id FROM packs WHERE LOWER(name) = LOWER(:pack_name)"),
-            {"pack_name": pack_name}
-        ).fetchone()
+    pack = get_reference_data().find_pack(pack_name)
     if not pack:
         raise HTTPException(
             status_code=404, 
             detail=f"Pack '{pack_name}' not found. Please check the name and try again."
         )
-    return pack[0]
+    return pack.id
+
+
+def add_cards_to_collection(connection, user_id: int, pack_id: int, card_counts: Mapping[int, int]):
+    """
+    Adds drawn cards to a user's collection with a single multi-row upsert, and bumps
+    the user's distinct-owned counter for the pack by the number of newly owned cards.
+
+    Args:
+        connection: Open database connection to run the statement on.
+        user_id (int): ID of the user.
+        pack_id (int): ID of the pack the cards were drawn from.
+        card_counts (Mapping[int, int]): Number of copies drawn per card id.
+    """
+    connection.execute(
+        sqlalchemy.text("""
+            WITH upserted AS (
+                INSERT INTO collection (user_id, card_id, quantity)
+                SELECT :user_id, drawn.card_id, drawn.quantity
+                FROM unnest(CAST(:card_ids AS INTEGER[]), CAST(:quantities AS INTEGER[]))
+                    AS drawn(card_id, quantity)
+                ON CONFLICT (user_id, card_id)
+                DO UPDATE SET quantity = collection.quantity + EXCLUDED.quantity
+                RETURNING (xmax = 0) AS is_new
+            )
+            INSERT INTO user_pack_progress (user_id, pack_id, owned_cards)
+            SELECT :user_id, :pack_id, COUNT(*) FILTER (WHERE is_new) FROM upserted
+            ON CONFLICT (user_id, pack_id)
+            DO UPDATE SET owned_cards = user_pack_progress.owned_cards + EXCLUDED.owned_cards
+        """),
+        {
+            "user_id": user_id,
+            "pack_id": pack_id,
+            "card_ids": list(card_counts.keys()),
+            "quantities": list(card_counts.values()),
+        }
+    )
+
+
+def debit_and_stock(connection, user_id: int, quantities: Mapping[int, int], total_cost: int) -> int:
+    """
+    Debits coins and adds packs to the user's inventory in a single statement.
+
+    Coins are only debited if the balance covers the cost, and packs are only
+    stocked if the debit happened.
+
+    Args:
+        connection: Open database connection to run the statement on.
+        user_id (int): ID of the user.
+        quantities (Mapping[int, int]): Number of packs to add per pack id.
+        total_cost (int): Coins to debit.
+
+    Returns:
+        int: The user's remaining coins.
+
+    Raises:
+        HTTPException: If the user does not exist or has insufficient coins.
+    """
+    # Pending ledger credits count toward the balance the debit is checked against
+    coins.fold_pending(connection, user_id)
+    purchase = connection.execute(
+        sqlalchemy.text("""
+            WITH debit AS (
+                UPDATE users
+                SET coins = coins - :total_cost
+                WHERE id = :user_id AND coins >= :total_cost
+                RETURNING id, coins
+            ),
+            stocked AS (
+                INSERT INTO inventory (user_id, pack_id, quantity)
+                SELECT debit.id, cart.pack_id, cart.quantity
+                FROM debit
+                CROSS JOIN unnest(CAST(:pack_ids AS INTEGER[]), CAST(:quantities AS INTEGER[]))
+                    AS cart(pack_id, quantity)
+                ON CONFLICT (user_id, pack_id)
+                DO UPDATE SET quantity = inventory.quantity + EXCLUDED.quantity
+                RETURNING pack_id
+            )
+            SELECT
+                (SELECT coins FROM users WHERE id = :user_id) AS balance,
+                (SELECT coins FROM debit) AS remaining_coins,
+                (SELECT COUNT(*) FROM stocked) AS packs_stocked
+        """),
+        {
+            "total_cost": total_cost,
+            "user_id": user_id,
+            "pack_ids": list(quantities.keys()),
+            "quantities": list(quantities.values()),
+        }
+    ).one()
+
+    if purchase.balance is None:
+        raise HTTPException(status_code=404, detail=f"User with ID {user_id} does not exist.")
+    if purchase.remaining_coins is None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Not enough coins. Current balance: {purchase.balance}, required: {total_cost}"
+        )
+    return purchase.remaining_coins
 
 
+def take_packs_from_inventory(connection, user_id: int, pack_id: int, pack_name: str, pack_quantity: int) -> int:
+    """
+    Removes packs that are about to be opened from the user's inventory.
+
+    Args:
+        connection: Open database connection to run the statements on.
+        user_id (int): ID of the user.
+        pack_id (int): ID of the pack.
+        pack_name (str): Name of the pack, used in error messages.
+        pack_quantity (int): Number of packs to remove.
+
+    Returns:
+        int: The user's current coin balance.
+
+    Raises:
+        HTTPException: If the user does not own enough of the pack.
+    """
+    owned_packs = connection.execute(
+        sqlalchemy.text("""
+            SELECT quantity FROM inventory
+            WHERE user_id = :user_id AND pack_id = :pack_id
+        """),
+        {"user_id": user_id, "pack_id": pack_id}
+    ).scalar_one_or_none()
+
+    if owned_packs is None or owned_packs < pack_quantity:
+        raise HTTPException(
+            status_code=409,
+            detail=f"User only has {owned_packs or 0} packs of '{pack_name}' but requested {pack_quantity}"
+        )
+
+    connection.execute(
+        sqlalchemy.text("""
+            UPDATE inventory
+            SET quantity = quantity - :pack_quantity
+            WHERE user_id = :user_id AND pack_id = :pack_id
+        """),
+        {"user_id": user_id, "pack_quantity": pack_quantity, "pack_id": pack_id}
+    )
+
+    return coins.get_balance(connection, user_id)
+
 
 @router.get("/{user_id}/recommended_pack", tags=["packs"], response_model=RecommendedPack)
-def recommended_pack(user_id: int):
+def recommended_pack(user_id: int, connection: sqlalchemy.Connection = Depends(db.get_connection)):
     """
     Recommends a pack to the user where they are missing the most cards.
 
+    Pack sizes come from the reference cache; the pack is picked in SQL against the
+    user's user_pack_progress rows, one primary-key lookup per pack, and comes back
+    as a single row. Packs the user has never opened have no progress row and count
+    as 0 owned.
+
     Args:
         user_id (int): ID of the user.
 
     Returns:
         RecommendedPack: The pack with the most missing cards.
     """
-    start_time = time.time()  # Start timer
-    check_user_exists(user_id)
-    with db.engine.begin() as connection:
-        results = connection.execute(
-            sqlalchemy.text("""
-                SELECT
-                    p.id AS pack_id,
-                    p.name AS pack_name,
-                    p.price AS cost,
-                    COUNT(DISTINCT CASE WHEN col.user_id = :user_id THEN c.id END) AS unique_cards_owned
-                FROM packs p
-                LEFT JOIN cards c ON c.pack_id = p.id
-                LEFT JOIN collection col ON col.card_id = c.id AND col.user_id = :user_id
-                GROUP BY p.id, p.name
-                ORDER BY p.id
-            """),
-            {"user_id": user_id}
-        ).fetchall()
-
-        min_cards_owned = float('inf')
-        recommended = None
-        for row in results:
-            if row.unique_cards_owned < min_cards_owned:
-                min_cards_owned = row.unique_cards_owned
-                recommended = row
-    end_time = time.time()  # End timer
-    elapsed_ms = (end_time - start_time) * 1000
-    print(f"Recommended pack for user {user_id} retrieved in {elapsed_ms:.2f} ms")
-    return RecommendedPack(Pack=recommended.pack_name, Currently_Missing=20 - recommended.unique_cards_owned)
+    check_user_exists(connection, user_id)
+    packs = get_reference_data().packs
+    recommended = connection.execute(
+        sqlalchemy.text("""
+            SELECT p.pack_id, p.card_count - COALESCE(progress.owned_cards, 0) AS missing
+            FROM unnest(CAST(:pack_ids AS INTEGER[]), CAST(:card_counts AS INTEGER[])) AS p(pack_id, card_count)
+            LEFT JOIN user_pack_progress AS progress
+                ON progress.user_id = :user_id AND progress.pack_id = p.pack_id
+            ORDER BY missing DESC, p.pack_id
+            LIMIT 1
+        """),
+        {
+            "user_id": user_id,
+            "pack_ids": list(packs.keys()),
+            "card_counts": [len(pack.card_ids) for pack in packs.values()],
+        }
+    ).one()
+    return RecommendedPack(Pack=packs[recommended.pack_id].name, Currently_Missing=recommended.missing)
 
 
 @router.post("/open_packs/{user_id}/{pack_name}/{pack_quantity}", tags=["packs"], response_model=PackOpenResult)
-def open_packs(user_id: int, pack_name: str, pack_quantity: int = Path(..., gt=0, description="Must be > 0")):
+def open_packs(user_id: int, pack_name: str, pack_quantity: int = Path(..., gt=0, description="Must be > 0"), connection: sqlalchemy.Connection = Depends(db.get_connection)):
     """
     Opens a number of packs and adds the drawn cards to the user's collection.
 
@@ -146,79 +295,88 @@ def open_packs(user_id: int, pack_name: str, pack_quantity: int = Path(..., gt=0
     Raises:
         HTTPException: If user does not have enough packs or pack does not exist.
     """
-    start_time = time.time()  # Start timer
     if not isinstance(pack_quantity, int) or pack_quantity <= 0:
         raise HTTPException(status_code=422, detail="Pack quantity must be a positive integer.")
 
-    check_user_exists(user_id)
+    check_user_exists(connection, user_id)
 
-    with db.engine.begin() as connection:
-        pack_id = check_pack_exists(pack_name)
+    pack_id = check_pack_exists(pack_name)
 
-        owned_packs = connection.execute(
-            sqlalchemy.text("""
-                SELECT quantity FROM inventory
-                WHERE user_id = :user_id AND pack_id = :pack_id
-            """),
-            {"user_id": user_id, "pack_id": pack_id}
-        ).scalar_one_or_none()
+    remaining_coins = take_packs_from_inventory(connection, user_id, pack_id, pack_name, pack_quantity)
+    reference_data = get_reference_data()
+    sampler = reference_data.samplers[pack_id]
 
-        if owned_packs is None or owned_packs < pack_quantity:
-            raise HTTPException(
-                status_code=409,
-                detail=f"User only has {owned_packs or 0} packs of '{pack_name}' but requested {pack_quantity}"
-            )
+    # Draw every card up front in one vectorized call, then write them all with a single upsert
+    drawn_ids = sampler.draw(5 * pack_quantity).tolist()
+    drawn_counts = Counter(drawn_ids)
 
-        connection.execute(
-            sqlalchemy.text("""
-                UPDATE inventory
-                SET quantity = quantity - :pack_quantity
-                WHERE user_id = :user_id AND pack_id = :pack_id
-            """),
-            {"user_id": user_id, "pack_quantity": pack_quantity, "pack_id": pack_id}
-        )
+    add_cards_to_collection(connection, user_id, pack_id, drawn_counts)
 
-        packs = connection.execute(
-            sqlalchemy.text("""
-                SELECT cards.name, cards.price FROM cards
-                WHERE cards.pack_id = :pack_id
-                ORDER BY cards.price ASC
-            """),
-            {"pack_id": pack_id}
-        ).all()
-
-        remaining_coins = connection.execute(
-            sqlalchemy.text("""
-                SELECT coins FROM users
-                WHERE id = :user_id
-            """),
-            {"user_id": user_id}
-        ).scalar_one()
-
-        opened_packs = []
-        for i in range(pack_quantity):
-            card_list = []
-            for _ in range(5):
-                chosen_card = weighted_random_choice(packs)
-                connection.execute(
-                    sqlalchemy.text("""
-                        INSERT INTO collection (user_id, card_id, quantity)
-                        VALUES (:user_id, (SELECT id FROM cards WHERE name = :card_name), 1)
-                        ON CONFLICT (user_id, card_id)
-                        DO UPDATE SET quantity = collection.quantity + 1
-                    """),
-                    {"user_id": user_id, "card_name": chosen_card}
-                )
-                card_list.append(chosen_card)
-            opened_packs.append(PackOpened(name=f"{pack_name} #{i + 1}", cards=card_list))
-    end_time = time.time()  # End timer
-    elapsed_ms = (end_time - start_time) * 1000
-    print(f"Completed in {elapsed_ms:.2f} ms")
+    opened_packs = [
+        PackOpened(
+            name=f"{pack_name} #{i + 1}",
+            cards=[reference_data.cards[card_id].name for card_id in drawn_ids[5 * i:5 * (i + 1)]]
+        )
+        for i in range(pack_quantity)
+    ]
     return PackOpenResult(remaining_coins=remaining_coins, opened_packs=opened_packs)
 
 
+def stream_opened_packs(pack_name: str, drawn_ids: List[int], remaining_coins: int):
+    """
+    Yields each opened pack as an NDJSON line, five drawn cards at a time, then a
+    summary line holding the user's remaining coins.
+    """
+    cards = get_reference_data().cards
+    for i in range(len(drawn_ids) // 5):
+        opened = PackOpened(
+            name=f"{pack_name} #{i + 1}",
+            cards=[cards[card_id].name for card_id in drawn_ids[5 * i:5 * (i + 1)]]
+        )
+        yield opened.model_dump_json() + "\n"
+    yield json.dumps({"remaining_coins": remaining_coins}) + "\n"
+
+
+@router.post("/open_packs/{user_id}/{pack_name}/{pack_quantity}/stream", tags=["packs"])
+def open_packs_stream(user_id: int, pack_name: str, pack_quantity: int = Path(..., gt=0, description="Must be > 0"), connection: sqlalchemy.Connection = Depends(db.get_connection)):
+    """
+    Opens a number of packs like open_packs, but streams the result as NDJSON.
+
+    Each opened pack is sent as its own line (a PackOpened object), followed by a
+    final `{"remaining_coins": ...}` line, so a large opening is never serialized
+    as one response body.
+
+    The packs are drawn and the inventory and collection written before streaming
+    starts, and the request's transaction commits before the first line is sent.
+    A slow or stalled client therefore holds no row locks or pooled connection
+    while it reads; if it disconnects early, the packs are still opened.
+
+    Args:
+        user_id (int): ID of the user.
+        pack_name (str): Name of the pack to open.
+        pack_quantity (int): Number of packs to open.
+
+    Returns:
+        StreamingResponse: application/x-ndjson stream of opened packs and the summary.
+
+    Raises:
+        HTTPException: If user does not have enough packs or pack does not exist.
+    """
+    pack_id = check_pack_exists(pack_name)
+    check_user_exists(connection, user_id)
+
+    remaining_coins = take_packs_from_inventory(connection, user_id, pack_id, pack_name, pack_quantity)
+    drawn_ids = get_reference_data().samplers[pack_id].draw(5 * pack_quantity).tolist()
+    add_cards_to_collection(connection, user_id, pack_id, Counter(drawn_ids))
+
+    return StreamingResponse(
+        stream_opened_packs(pack_name, drawn_ids, remaining_coins),
+        media_type="application/x-ndjson",
+    )
+
+
 @router.post("/purchase_packs/{user_id}/{pack_name}/{pack_quantity}", tags=["packs"], response_model=Checkout)
-def purchase_packs(user_id: int, pack_name: str, pack_quantity: int = Path(..., gt=0, description="Must be > 0")):
+def purchase_packs(user_id: int, pack_name: str, pack_quantity: int = Path(..., gt=0, description="Must be > 0"), connection: sqlalchemy.Connection = Depends(db.get_connection)):
     """
     Allows a user to purchase a specific quantity of packs using in-game coins.
 
@@ -233,81 +391,44 @@ def purchase_packs(user_id: int, pack_name: str, pack_quantity: int = Path(...,
     Raises:
         HTTPException: If the user has insufficient coins or pack does not exist.
     """
-    start_time = time.time()  # Start timer
     if not isinstance(pack_quantity, int) or pack_quantity <= 0:
         raise HTTPException(status_code=422, detail="Pack quantity must be a positive integer.")
 
-    check_user_exists(user_id)
     pack_id = check_pack_exists(pack_name)
+    total_cost = get_reference_data().packs[pack_id].price * pack_quantity
 
-    with db.engine.begin() as connection:
-        pack_data = connection.execute(
-            sqlalchemy.text("""
-                SELECT id, price FROM packs
-                WHERE name = :pack_name
-            """),
-            {"pack_name": pack_name}
-        ).fetchone()
-
-        if not pack_data:
-            raise HTTPException(status_code=404, detail="Pack not found")
-
-        pack_id, pack_price = pack_data
-        total_cost = pack_price * pack_quantity
-
-        user_data = connection.execute(
-            sqlalchemy.text("""
-                SELECT coins FROM users
-                WHERE id = :user_id
-            """),
-            {"user_id": user_id}
-        ).fetchone()
-
-        if not user_data:
-            raise HTTPException(status_code=404, detail="User not found")
-
-        user_coins = user_data[0]
-        if user_coins < total_cost:
-            raise HTTPException(
-                status_code=409,
-                detail=f"Not enough coins. Current balance: {user_coins}, required: {total_cost}"
-            )
+    debit_and_stock(connection, user_id, {pack_id: pack_quantity}, total_cost)
+    return Checkout(pack=pack_name, total_spent=total_cost)
 
-        inventory_data = connection.execute(
-            sqlalchemy.text("""
-                SELECT quantity FROM inventory
-                WHERE user_id = :user_id AND pack_id = :pack_id
-            """),
-            {"user_id": user_id, "pack_id": pack_id}
-        ).fetchone()
-
-        if inventory_data:
-            connection.execute(
-                sqlalchemy.text("""
-                    UPDATE inventory
-                    SET quantity = quantity + :pack_quantity
-                    WHERE user_id = :user_id AND pack_id = :pack_id
-                """),
-                {"pack_quantity": pack_quantity, "user_id": user_id, "pack_id": pack_id}
-            )
-        else:
-            connection.execute(
-                sqlalchemy.text("""
-                    INSERT INTO inventory (user_id, pack_id, quantity)
-                    VALUES (:user_id, :pack_id, :quantity)
-                """),
-                {"user_id": user_id, "pack_id": pack_id, "quantity": pack_quantity}
-            )
 
-        connection.execute(
-            sqlalchemy.text("""
-                UPDATE users
-                SET coins = coins - :total_cost
-                WHERE id = :user_id
-            """),
-            {"total_cost": total_cost, "user_id": user_id}
-        )
-    end_time = time.time()  # End timer
-    elapsed_ms = (end_time - start_time) * 1000
-    print(f"Completed in {elapsed_ms:.2f} ms")
-    return Checkout(pack=pack_name, total_spent=total_cost)
+@router.post("/checkout/{user_id}", tags=["packs"], response_model=CartCheckout)
+def checkout(user_id: int, cart: List[CartLine], connection: sqlalchemy.Connection = Depends(db.get_connection)):
+    """
+    Purchases several pack types at once, debiting coins once for the whole cart.
+
+    Args:
+        user_id (int): ID of the user.
+        cart (List[CartLine]): Pack names and quantities to purchase.
+
+    Returns:
+        CartCheckout: Amount spent per line, total spent and remaining coins.
+
+    Raises:
+        HTTPException: If the cart is empty, a pack does not exist, the user does not exist,
+            or the user has insufficient coins for the whole cart.
+    """
+    if not cart:
+        raise HTTPException(status_code=422, detail="Cart must contain at least one pack.")
+
+    reference_data = get_reference_data()
+    lines = []
+    quantities = {}
+    for line in cart:
+        pack = reference_data.packs[check_pack_exists(line.pack_name)]
+        quantities[pack.id] = quantities.get(pack.id, 0) + line.quantity
+        lines.append(Checkout(pack=pack.name, total_spent=pack.price * line.quantity))
+    total_cost = sum(line.total_spent for line in lines)
+
+    remaining_coins = debit_and_stock(connection, user_id, quantities, total_cost)
+
+    return CartCheckout(lines=lines, total_spent=total_cost, remaining_coins=remaining_coins)
@@ -2,43 +2,52 @@ import sqlalchemy
 import os
 import dotenv
 from faker import Faker
-import random
-import numpy as np
 import sqlalchemy.exc
 from src.api import auth
 from src import database as db
 from src.api import packs
-import math
+from src.rng import get_generator
+from src.sampling import AliasSampler
 import string
 
 def generate_a_bajillion_users():
+    """
+    Seeds 100,000 random users with collections, decks, packs and displays.
+
+    Only meant to run as part of migration 87ac8689a9c0, against the schema of that
+    revision: it writes deck_cards.card_name and does not maintain
+    user_pack_progress, which the later 3f6b2d9e1a47 migration creates and
+    backfills from the seeded collections. Running it against a newer schema
+    fails or leaves recommended_pack's counters wrong.
+    """
     num_users = 100000
     fake = Faker()
     Faker.seed(0)
+    rng = get_generator()
+
+    # Cards, their prices and packs don't change while users are generated
+    with db.engine.begin() as conn:
+        all_cards = conn.execute(sqlalchemy.text("""
+            SELECT cards.id, cards.name, cards.price FROM cards
+            ORDER BY cards.price ASC;
+            """)).all()
+        all_packs = conn.execute(sqlalchemy.text("SELECT id FROM packs")).scalars().all()
+    sampler = AliasSampler.from_prices([id for id, _, _ in all_cards], [price for _, _, price in all_cards])
 
     print("creating fake users...")
     for i in range(num_users):
         with db.engine.begin() as conn:
-            all_cards = conn.execute(sqlalchemy.text("""
-                SELECT cards.id, cards.name, cards.price FROM cards
-                ORDER BY cards.price ASC;
-                """)).all()
-            
             #create 1 user
             base_name = fake.user_name()
-            extra_uniqueness = ''.join(random.choices(string.ascii_letters + string.digits + "!@#$%^&*()-_=+[]{}", k=random.randint(2, 7)))
+            extra_uniqueness = ''.join(rng.choice(list(string.ascii_letters + string.digits + "!@#$%^&*()-_=+[]{}"), size=rng.integers(2, 8)))
             username = base_name + extra_uniqueness
-            rand_coins = abs(int(np.random.normal(loc=100, scale=20)))
+            rand_coins = abs(int(rng.normal(loc=100, scale=20)))
             user_id = conn.execute(sqlalchemy.text("""
             INSERT INTO users (username, coins) VALUES (:username, :coins) RETURNING id;
             """), {"username": username, "coins": rand_coins}).scalar_one()
             
             #create 10 cards in the collection of the new user
-            for i in range(10):
-                max_price = max(price for _, _, price in all_cards)
-                weights = [math.sqrt(max_price - price + 1) for _, _, price in all_cards]
-                all_card_ids = [id for id, _, _ in all_cards]
-                chosen_card = random.choices(all_card_ids, weights=weights, k=1)[0]
+            for chosen_card in sampler.draw(10, rng).tolist():
 
                 conn.execute(sqlalchemy.text("""
                 INSERT INTO collection (user_id, card_id, quantity) 
@@ -57,7 +66,7 @@ def generate_a_bajillion_users():
             
             card_names = [card.name for card in cards_owned]
             if (len(cards_owned) >= 5):
-                rand_deck = random.sample(card_names, k=5)
+                rand_deck = rng.choice(card_names, size=5, replace=False).tolist()
                 deck_name = '_'.join(fake.words())
                 deck_id = conn.execute(sqlalchemy.text("""
                 INSERT INTO decks (user_id, deck_name) VALUES (:user_id, :deck_name) RETURNING id;
@@ -69,8 +78,7 @@ def generate_a_bajillion_users():
                     """), {"deck_id": deck_id, "card_name": card_name})
 
             #give each user 1 pack in inventory
-            all_packs = conn.execute(sqlalchemy.text("SELECT id FROM packs")).scalars().all()
-            rand_pack = random.choice(all_packs)
+            rand_pack = all_packs[rng.integers(len(all_packs))]
             conn.execute(sqlalchemy.text("""
             INSERT INTO inventory (user_id, pack_id, quantity) VALUES (:user_id, :pack_id, 1);
             """), {"user_id": user_id, "pack_id": rand_pack})
@@ -78,9 +86,9 @@ def generate_a_bajillion_users():
             #insert 0-4 cards into the user's display
             display_num = 1
             if (len(cards_owned) < 5):
-                display_num = np.random.randint(0, len(cards_owned))
+                display_num = rng.integers(0, len(cards_owned))
             else:
-                display_num = np.random.randint(0, 5)
+                display_num = rng.integers(0, 5)
             
             cards_owned_ids = [card.card_id for card in cards_owned]
             
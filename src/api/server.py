@@ -1,6 +1,16 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from src.api import inventory, catalog, packs, user, collection, cards, decks, battle, display
+from src.api import inventory, catalog, packs, user, collection, cards, decks, battle, display, admin
+from src.api import async_routes
+from fastapi.responses import PlainTextResponse
 from starlette.middleware.cors import CORSMiddleware
+from src import database as db
+from src import coins
+from src import config
+from src import metrics
+from src.profiling import ProfilingMiddleware
+from src.reference_data import get_reference_data
 #NOTE FROM SHANE: STILL NEEDS TO BE MODIFIED, CONFUSED AS TO HOW.
 
 description = """
@@ -39,9 +49,27 @@ tags_metadata = [
     {
         "name": "display",
         "description": "Add or remove a card from the user's collection to their personal display."
+    },
+    {
+        "name": "admin",
+        "description": "Maintenance operations, such as reloading the cached cards and packs."
     }
 ]
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the cards and packs, and build the card search index from them, before the first request
+    await asyncio.to_thread(get_reference_data)
+    # In ledger mode, fold appended coin credits into users.coins in the background
+    settings = config.get_settings()
+    compaction = None
+    if settings.COIN_LEDGER and settings.COIN_LEDGER_COMPACT_INTERVAL > 0:
+        compaction = asyncio.create_task(coins.compact_periodically(settings.COIN_LEDGER_COMPACT_INTERVAL))
+    yield
+    if compaction is not None:
+        compaction.cancel()
+
+
 app = FastAPI(
     title="Pokemon-Card-Collection",
     description=description,
@@ -52,6 +80,7 @@ app = FastAPI(
         "email": "sbillups@calpoly.edu",
     },
     openapi_tags=tags_metadata,
+    lifespan=lifespan,
 )
 
 origins = ["https://potion-exchange.vercel.app"]
@@ -63,18 +92,26 @@ app.add_middleware(
     allow_methods=["GET", "OPTIONS"],
     allow_headers=["*"],
 )
+if config.get_settings().PROFILE_DIR:
+    app.add_middleware(ProfilingMiddleware, profile_dir=config.get_settings().PROFILE_DIR)
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.install_query_hooks(db.engine)
+if db.async_engine is not None:
+    metrics.install_query_hooks(db.async_engine.sync_engine)
 
-app.include_router(inventory.router)
-app.include_router(catalog.router)
-app.include_router(packs.router)
-app.include_router(user.router)
-app.include_router(decks.router)
-app.include_router(collection.router)
-app.include_router(cards.router)
-app.include_router(battle.router)
-app.include_router(display.router)
+for router in (
+    inventory.router, catalog.router, packs.router, user.router, decks.router,
+    collection.router, cards.router, battle.router, display.router, admin.router,
+):
+    # In async mode, endpoints that use the request connection run on the event loop
+    app.include_router(async_routes.async_router(router) if config.get_settings().ASYNC_DB else router)
 
 
 @app.get("/")
 async def root():
     return {"message": "Pokemon cards are ready for collecting!"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
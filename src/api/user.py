@@ -1,5 +1,4 @@
 from dataclasses import dataclass
-import time
 from fastapi import APIRouter, Depends, status, HTTPException
 from pydantic import BaseModel, Field, field_validator
 from typing import List
@@ -26,7 +25,7 @@ class UserProfile(BaseModel):
     coins: int
 
 @router.post("/register/", response_model=UserCreateResponse)
-def register_user(username: str):
+def register_user(username: str, connection: sqlalchemy.Connection = Depends(db.get_connection)):
     """
     Register a new user.
 
@@ -39,37 +38,32 @@ def register_user(username: str):
     Returns:
     - UserCreateResponse: An object containing the new user's ID.
     """
-    start_time = time.time()  # Start timer
-    with db.engine.begin() as conn:
-        # Check if user already exists
-        existing_user = conn.execute(
-            sqlalchemy.text("SELECT id FROM users WHERE username = :username"),
-            {"username": username}
-        ).fetchone()
-
-        if existing_user:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Registration failed: username '{username}' is already taken."
-            )
-
-        # Insert new user with default 100 coins
-        result = conn.execute(
-            sqlalchemy.text("""
-                INSERT INTO users (username, coins)
-                VALUES (:username, 100)
-                RETURNING id
-            """),
-            {"username": username}
+    # Check if user already exists
+    existing_user = connection.execute(
+        sqlalchemy.text("SELECT id FROM users WHERE username = :username"),
+        {"username": username}
+    ).fetchone()
+
+    if existing_user:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Registration failed: username '{username}' is already taken."
         )
-        user_id = result.scalar()
-    end_time = time.time()  # End timer
-    elapsed_ms = (end_time - start_time) * 1000
-    print(f"User registration for '{username}' completed in {elapsed_ms:.2f} ms")
+
+    # Insert new user with default 100 coins
+    result = connection.execute(
+        sqlalchemy.text("""
+            INSERT INTO users (username, coins)
+            VALUES (:username, 100)
+            RETURNING id
+        """),
+        {"username": username}
+    )
+    user_id = result.scalar()
     return UserCreateResponse(user_id=user_id)
 
 @router.get("/profile/{user_id}", response_model=UserProfile)
-def get_user_profile(user_id: int):
+def get_user_profile(user_id: int, connection: sqlalchemy.Connection = Depends(db.get_connection)):
     """
     Retrieve a user's profile.
 
@@ -82,23 +76,19 @@ def get_user_profile(user_id: int):
     Returns:
     - UserProfile: An object containing the user's ID, username, and coin balance.
     """
-    start_time = time.time()  # Start timer
-    with db.engine.begin() as conn:
-        user = conn.execute(
-            sqlalchemy.text("""
-                SELECT id, username, coins
-                FROM users
-                WHERE id = :user_id
-            """),
-            {"user_id": user_id}
-        ).fetchone()
-
-        if not user:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Profile retrieval failed: user with ID {user_id} not found."
-            )
-        end_time = time.time()  # End timer
-        elapsed_ms = (end_time - start_time) * 1000
-        print(f"User profile retrieval for ID {user_id} completed in {elapsed_ms:.2f} ms")
-        return UserProfile(user_id=user.id, username=user.username, coins=user.coins)
+    user = connection.execute(
+        sqlalchemy.text("""
+            SELECT u.id, u.username, b.coins
+            FROM users AS u
+            JOIN user_balances AS b ON b.user_id = u.id
+            WHERE u.id = :user_id
+        """),
+        {"user_id": user_id}
+    ).fetchone()
+
+    if not user:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Profile retrieval failed: user with ID {user_id} not found."
+        )
+    return UserProfile(user_id=user.id, username=user.username, coins=user.coins)
@@ -0,0 +1,105 @@
+import gzip
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import brotli
+from fastapi import Request, Response
+
+from src.reference_data import ReferenceData, get_reference_data
+
+CACHE_CONTROL = "public, max-age=300"
+
+
+@dataclass(frozen=True)
+class CachedBody:
+    """One JSON payload, serialized once and kept in every encoding we serve."""
+    version: str
+    encodings: dict[str, bytes]
+    etags: dict[str, str]
+
+    @classmethod
+    def build(cls, version: str, payload: Any) -> "CachedBody":
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        encodings = {
+            "identity": body,
+            "gzip": gzip.compress(body, compresslevel=9, mtime=0),
+            "br": brotli.compress(body),
+        }
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        # Each encoding is a different byte sequence, so each gets its own strong ETag
+        etags = {
+            encoding: f'"{digest}"' if encoding == "identity" else f'"{digest}-{encoding}"'
+            for encoding in encodings
+        }
+        return cls(version, encodings, etags)
+
+
+_cache: dict[str, CachedBody] = {}
+_lock = threading.Lock()
+
+
+def _choose_encoding(accept_encoding: str, available) -> str:
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, *params = part.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+    for encoding in ("br", "gzip"):
+        if encoding in available and (encoding in accepted or "*" in accepted):
+            return encoding
+    return "identity"
+
+
+def _not_modified(if_none_match: str, etags) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return not tags.isdisjoint(etags)
+
+
+def cached_json_response(request: Request, key: str, build: Callable[[ReferenceData], Any]) -> Response:
+    """
+    Serves a JSON payload derived only from the cached reference data.
+
+    The payload is serialized and compressed once per reference data version and
+    reused until the version changes. Requests whose If-None-Match holds the current
+    ETag get an empty 304.
+
+    Args:
+        request (Request): The incoming request, for its Accept-Encoding and If-None-Match headers.
+        key (str): Name of the payload in the cache, e.g. "cards".
+        build (Callable[[ReferenceData], Any]): Builds the JSON-serializable payload.
+
+    Returns:
+        Response: The encoded body, or a 304, with ETag, Cache-Control and Vary headers.
+    """
+    reference_data = get_reference_data()
+    cached = _cache.get(key)
+    if cached is None or cached.version != reference_data.version:
+        with _lock:
+            cached = _cache.get(key)
+            if cached is None or cached.version != reference_data.version:
+                cached = CachedBody.build(reference_data.version, build(reference_data))
+                _cache[key] = cached
+
+    encoding = _choose_encoding(request.headers.get("accept-encoding", ""), cached.encodings)
+    headers = {"ETag": cached.etags[encoding], "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _not_modified(if_none_match, cached.etags.values()):
+        return Response(status_code=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=cached.encodings[encoding], media_type="application/json", headers=headers)
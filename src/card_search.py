@@ -0,0 +1,120 @@
+import re
+from dataclasses import dataclass
+from typing import Iterable
+
+# Matches scoring below this trigram similarity are dropped unless they are prefix or substring matches
+SIMILARITY_THRESHOLD = 0.3
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def _jaccard(a: frozenset[str], b: frozenset[str]) -> float:
+    common = len(a & b)
+    return common / (len(a) + len(b) - common) if common else 0.0
+
+
+def trigrams(text: str) -> frozenset[str]:
+    """
+    Trigrams of each word of `text`, padded the way pg_trgm pads them: two spaces
+    before the word and one after, so "Muk" gives "  m", " mu", "muk" and "uk ".
+    """
+    grams = set()
+    for word in _WORD.findall(text.casefold()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+@dataclass(frozen=True)
+class SearchMatch:
+    card_id: int
+    name: str
+    match: str
+    similarity: float
+
+
+class CardSearchIndex:
+    """
+    In-memory trigram index over card names for prefix, substring and typo-tolerant search.
+
+    Postings map each trigram to the cards whose name contains it, so a query only
+    scores cards that share at least one trigram with it. Built once per reference
+    data snapshot and never modified.
+    """
+
+    def __init__(self, cards: Iterable[tuple[int, str]]):
+        """
+        Args:
+            cards (Iterable[tuple[int, str]]): (card id, card name) pairs to index.
+        """
+        self._names: dict[int, str] = {}
+        self._folded: dict[int, str] = {}
+        self._trigrams: dict[int, frozenset[str]] = {}
+        self._word_trigrams: dict[int, tuple[frozenset[str], ...]] = {}
+        postings: dict[str, list[int]] = {}
+        for card_id, name in cards:
+            self._names[card_id] = name
+            self._folded[card_id] = name.casefold()
+            self._trigrams[card_id] = trigrams(name)
+            self._word_trigrams[card_id] = tuple(trigrams(word) for word in _WORD.findall(name))
+            for gram in self._trigrams[card_id]:
+                postings.setdefault(gram, []).append(card_id)
+        self._postings = {gram: tuple(card_ids) for gram, card_ids in postings.items()}
+
+    def search(self, query: str, limit: int = 10) -> list[SearchMatch]:
+        """
+        Finds the cards whose names best match `query`.
+
+        Exact matches rank first, then prefix matches, then substring matches, then
+        the rest by trigram similarity: shared trigrams over all distinct trigrams, as
+        in pg_trgm's similarity(), taken against the whole name or its best matching
+        word, so "gengr" is close to "Gengar VMAX".
+
+        Args:
+            query (str): Text to look for, case-insensitive.
+            limit (int): Most matches to return.
+
+        Returns:
+            list[SearchMatch]: Best matches first.
+        """
+        folded = query.casefold().strip()
+        if not folded:
+            return []
+        query_trigrams = trigrams(folded)
+
+        candidates = set()
+        for gram in query_trigrams:
+            candidates.update(self._postings.get(gram, ()))
+        # Queries shorter than a word's trigrams can still be a prefix or substring
+        if len(folded) < 3:
+            candidates.update(card_id for card_id, name in self._folded.items() if folded in name)
+
+        ranked = []
+        for card_id in candidates:
+            name = self._folded[card_id]
+            similarity = max(
+                _jaccard(query_trigrams, self._trigrams[card_id]),
+                *(_jaccard(query_trigrams, word) for word in self._word_trigrams[card_id]),
+            )
+            if name == folded:
+                match = "exact"
+            elif name.startswith(folded):
+                match = "prefix"
+            elif folded in name:
+                match = "substring"
+            elif similarity >= SIMILARITY_THRESHOLD:
+                match = "similar"
+            else:
+                continue
+            rank = ("exact", "prefix", "substring", "similar").index(match)
+            ranked.append((rank, -similarity, self._names[card_id], card_id, match, similarity))
+
+        ranked.sort()
+        return [
+            SearchMatch(card_id=card_id, name=name, match=match, similarity=similarity)
+            for _, _, name, card_id, match, similarity in ranked[:limit]
+        ]
+
+    def suggest(self, query: str, limit: int = 3) -> list[str]:
+        """Names of the closest cards to `query`, for "did you mean" hints."""
+        return [match.name for match in self.search(query, limit)]
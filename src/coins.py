@@ -0,0 +1,149 @@
+import asyncio
+import logging
+from typing import Sequence
+
+import sqlalchemy
+
+from src import config
+from src import database as db
+
+logger = logging.getLogger(__name__)
+
+# When enabled, credits are appended to coin_ledger instead of updating the user's row
+LEDGER_ENABLED = config.get_settings().COIN_LEDGER
+# Most ledger entries folded into users.coins by one compaction statement
+COMPACT_BATCH_SIZE = 10_000
+
+
+def credit(connection: sqlalchemy.Connection, user_id: int, amount: int, reason: str):
+    """
+    Gives a user coins.
+
+    In ledger mode the credit is an insert into coin_ledger, so concurrent credits
+    for the same user never wait on each other for the users row. Otherwise the
+    users row is updated directly.
+
+    Args:
+        connection: Open database connection to run the statement on.
+        user_id (int): ID of the user.
+        amount (int): Coins to add.
+        reason (str): What the coins are for, kept in the ledger, e.g. "battle".
+    """
+    credit_many(connection, [user_id], [amount], reason)
+
+
+def credit_many(connection: sqlalchemy.Connection, user_ids: Sequence[int], amounts: Sequence[int], reason: str):
+    """
+    Gives several users coins with one statement. See credit.
+    """
+    params = {"user_ids": list(user_ids), "amounts": list(amounts), "reason": reason}
+    if LEDGER_ENABLED:
+        connection.execute(
+            sqlalchemy.text("""
+                INSERT INTO coin_ledger (user_id, amount, reason)
+                SELECT user_id, amount, :reason
+                FROM unnest(CAST(:user_ids AS INTEGER[]), CAST(:amounts AS INTEGER[])) AS credit(user_id, amount)
+            """),
+            params
+        )
+    else:
+        connection.execute(
+            sqlalchemy.text("""
+                UPDATE users
+                SET coins = users.coins + credit.amount
+                FROM unnest(CAST(:user_ids AS INTEGER[]), CAST(:amounts AS INTEGER[])) AS credit(user_id, amount)
+                WHERE users.id = credit.user_id
+            """),
+            params
+        )
+
+
+def fold_pending(connection: sqlalchemy.Connection, user_id: int):
+    """
+    Moves a user's unapplied ledger credits into users.coins.
+
+    Called before a debit, so the debit's `coins >= cost` check (and the
+    check_coins_positive constraint) sees every credit the user has received.
+    Does nothing outside ledger mode.
+    """
+    if not LEDGER_ENABLED:
+        return
+    connection.execute(
+        sqlalchemy.text("""
+            WITH pending AS (
+                UPDATE coin_ledger
+                SET applied = TRUE
+                WHERE user_id = :user_id AND NOT applied
+                RETURNING amount
+            )
+            UPDATE users
+            SET coins = coins + (SELECT SUM(amount) FROM pending)
+            WHERE id = :user_id AND EXISTS (SELECT 1 FROM pending)
+        """),
+        {"user_id": user_id}
+    )
+
+
+def get_balance(connection: sqlalchemy.Connection, user_id: int) -> int | None:
+    """
+    Returns the user's coins including unapplied ledger credits, or None if the user does not exist.
+    """
+    return connection.execute(
+        sqlalchemy.text("SELECT coins FROM user_balances WHERE user_id = :user_id"),
+        {"user_id": user_id}
+    ).scalar_one_or_none()
+
+
+def compact(batch_size: int = COMPACT_BATCH_SIZE) -> tuple[int, int]:
+    """
+    Folds unapplied ledger credits into users.coins, oldest first, in batches.
+
+    Entries locked by a concurrent fold are skipped and picked up by a later run.
+
+    Returns:
+        tuple[int, int]: Number of ledger entries applied and of users credited.
+    """
+    entries = users = 0
+    while True:
+        with db.engine.begin() as connection:
+            batch = connection.execute(
+                sqlalchemy.text("""
+                    WITH pending AS (
+                        UPDATE coin_ledger
+                        SET applied = TRUE
+                        WHERE id IN (
+                            SELECT id FROM coin_ledger
+                            WHERE NOT applied
+                            ORDER BY id
+                            LIMIT :batch_size
+                            FOR UPDATE SKIP LOCKED
+                        )
+                        RETURNING user_id, amount
+                    ),
+                    credited AS (
+                        UPDATE users
+                        SET coins = users.coins + totals.amount
+                        FROM (SELECT user_id, SUM(amount) AS amount FROM pending GROUP BY user_id) AS totals
+                        WHERE users.id = totals.user_id
+                        RETURNING users.id
+                    )
+                    SELECT (SELECT COUNT(*) FROM pending) AS entries, (SELECT COUNT(*) FROM credited) AS users
+                """),
+                {"batch_size": batch_size}
+            ).one()
+        entries += batch.entries
+        users += batch.users
+        if batch.entries < batch_size:
+            return entries, users
+
+
+async def compact_periodically(interval: float):
+    """
+    Runs compact every `interval` seconds until cancelled. Started by the app in ledger mode.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(compact)
+        except Exception:
+            logger.exception("Coin ledger compaction failed")
@@ -12,6 +12,18 @@ load_dotenv(dotenv_path=find_dotenv(".env"), override=True)
 class Settings:
     API_KEY: str | None = os.getenv("API_KEY")
     POSTGRES_URI: str | None = os.getenv("POSTGRES_URI")
+    # Optional seed for the shared random number generators (see src/rng.py)
+    RNG_SEED: int | None = int(os.getenv("RNG_SEED")) if os.getenv("RNG_SEED") else None
+    # Warn when one request runs the same SQL statement more than this many times
+    QUERY_REPEAT_WARN_THRESHOLD: int = int(os.getenv("QUERY_REPEAT_WARN_THRESHOLD", "10"))
+    # Requests with an `X-Profile: <API_KEY>` header are profiled into this directory; unset disables profiling
+    PROFILE_DIR: str | None = os.getenv("PROFILE_DIR")
+    # Append coin credits to coin_ledger instead of updating users.coins (see src/coins.py)
+    COIN_LEDGER: bool = os.getenv("COIN_LEDGER", "false").lower() in ("1", "true", "yes")
+    # Seconds between background ledger compactions in ledger mode; 0 disables them
+    COIN_LEDGER_COMPACT_INTERVAL: float = float(os.getenv("COIN_LEDGER_COMPACT_INTERVAL", "60"))
+    # Serve endpoints on the event loop through an async engine instead of the threadpool
+    ASYNC_DB: bool = os.getenv("ASYNC_DB", "false").lower() in ("1", "true", "yes")
 
     def __init__(self):
         if not self.API_KEY:
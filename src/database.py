@@ -1,5 +1,31 @@
 from src import config
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
 
 connection_url = config.get_settings().POSTGRES_URI
 engine = create_engine(connection_url, pool_pre_ping=True)
+# Only built in async mode (settings.ASYNC_DB); postgresql+psycopg URLs use psycopg's async driver here
+async_engine = create_async_engine(connection_url, pool_pre_ping=True) if config.get_settings().ASYNC_DB else None
+
+# SQLSTATE raised by a NOWAIT row lock when another transaction holds the row
+LOCK_NOT_AVAILABLE = "55P03"
+# SQLSTATE raised when an insert or update violates a unique index
+UNIQUE_VIOLATION = "23505"
+
+
+def get_connection():
+    """
+    FastAPI dependency that gives a request one connection and one transaction.
+
+    The transaction commits when the endpoint returns, and rolls back if it raises.
+    """
+    with engine.begin() as connection:
+        yield connection
+
+
+async def get_async_connection():
+    """
+    Async counterpart of get_connection, on the async engine.
+    """
+    async with async_engine.begin() as connection:
+        yield connection
@@ -0,0 +1,213 @@
+import bisect
+import logging
+import re
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_BUCKET_BOUNDS_NS = [int(bound * 1e9) for bound in LATENCY_BUCKETS]
+QUERY_REPEAT_WARN_THRESHOLD = config.get_settings().QUERY_REPEAT_WARN_THRESHOLD
+
+
+class RequestQueries:
+    """SQL statements run while handling one request."""
+
+    __slots__ = ("scope", "count", "total_ns", "slowest_ns", "slowest_statement", "statement_counts")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.count = 0
+        self.total_ns = 0
+        self.slowest_ns = 0
+        self.slowest_statement = ""
+        self.statement_counts = defaultdict(int)
+
+    def observe(self, statement: str, elapsed_ns: int):
+        self.count += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.slowest_ns:
+            self.slowest_ns = elapsed_ns
+            self.slowest_statement = statement
+        self.statement_counts[statement] += 1
+        if self.statement_counts[statement] == QUERY_REPEAT_WARN_THRESHOLD + 1:
+            logger.warning(
+                "Possible N+1 query: %s %s ran the same statement more than %d times: %s",
+                self.scope["method"], route_label(self.scope), QUERY_REPEAT_WARN_THRESHOLD, _one_line(statement)
+            )
+
+
+# Statements run outside of a request (scripts, migrations) are not recorded
+current_queries: ContextVar[RequestQueries | None] = ContextVar("current_queries", default=None)
+
+
+class RouteMetrics:
+    """Latency histogram and status counts for one (method, route) pair."""
+
+    __slots__ = (
+        "bucket_counts", "total_ns", "count", "status_counts",
+        "db_queries", "db_total_ns", "db_slowest_ns", "db_slowest_statement",
+    )
+
+    def __init__(self):
+        # One count per bucket plus the +Inf bucket; made cumulative only when rendered
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total_ns = 0
+        self.count = 0
+        self.status_counts = defaultdict(int)
+        self.db_queries = 0
+        self.db_total_ns = 0
+        self.db_slowest_ns = 0
+        self.db_slowest_statement = ""
+
+    def observe(self, elapsed_ns: int, status_code: int, queries: RequestQueries):
+        self.bucket_counts[bisect.bisect_left(_BUCKET_BOUNDS_NS, elapsed_ns)] += 1
+        self.total_ns += elapsed_ns
+        self.count += 1
+        self.status_counts[status_code] += 1
+        self.db_queries += queries.count
+        self.db_total_ns += queries.total_ns
+        if queries.slowest_ns > self.db_slowest_ns:
+            self.db_slowest_ns = queries.slowest_ns
+            self.db_slowest_statement = queries.slowest_statement
+
+
+routes: dict[tuple[str, str], RouteMetrics] = defaultdict(RouteMetrics)
+# The route is only known once routing has run, so in-flight requests are counted per method
+in_flight: dict[str, int] = defaultdict(int)
+
+
+def route_label(scope) -> str:
+    """Path template of the matched route, so every user id shares one series."""
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency, status codes and in-flight requests.
+
+    Recording only increments counters; all formatting happens when /metrics is scraped.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        in_flight[method] += 1
+        queries = RequestQueries(scope)
+        token = current_queries.set(queries)
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter_ns()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed_ns = time.perf_counter_ns() - start
+            in_flight[method] -= 1
+            current_queries.reset(token)
+            routes[(method, route_label(scope))].observe(elapsed_ns, status_code, queries)
+
+
+def install_query_hooks(engine):
+    """
+    Times every statement run on the engine and attributes it to the current request.
+
+    The start time lives on the statement's execution context, which is discarded
+    with it, so a statement that fails leaves nothing behind on the pooled connection.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_start_ns = time.perf_counter_ns()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ns = time.perf_counter_ns() - context._query_start_ns
+        queries = current_queries.get()
+        if queries is not None:
+            queries.observe(statement, elapsed_ns)
+
+
+def _one_line(statement: str, limit: int = 200) -> str:
+    return re.sub(r"\s+", " ", statement).strip()[:limit]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+def render_prometheus() -> str:
+    """Renders every recorded metric in the Prometheus text exposition format."""
+    lines = [
+        "# HELP http_request_duration_seconds Request latency by route.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, route), metrics in sorted(routes.items()):
+        cumulative = 0
+        for bound, bucket_count in zip(LATENCY_BUCKETS + ("+Inf",), metrics.bucket_counts):
+            cumulative += bucket_count
+            lines.append(f"http_request_duration_seconds_bucket{{{_labels(method=method, route=route, le=bound)}}} {cumulative}")
+        lines.append(f"http_request_duration_seconds_sum{{{_labels(method=method, route=route)}}} {metrics.total_ns / 1e9}")
+        lines.append(f"http_request_duration_seconds_count{{{_labels(method=method, route=route)}}} {metrics.count}")
+
+    lines += [
+        "# HELP http_responses_total Responses by route and status code.",
+        "# TYPE http_responses_total counter",
+    ]
+    for (method, route), metrics in sorted(routes.items()):
+        for status_code, count in sorted(metrics.status_counts.items()):
+            lines.append(f"http_responses_total{{{_labels(method=method, route=route, status=status_code)}}} {count}")
+
+    lines += [
+        "# HELP db_queries_total SQL statements run, by route.",
+        "# TYPE db_queries_total counter",
+    ]
+    for (method, route), metrics in sorted(routes.items()):
+        lines.append(f"db_queries_total{{{_labels(method=method, route=route)}}} {metrics.db_queries}")
+
+    lines += [
+        "# HELP db_query_duration_seconds_total Time spent running SQL statements, by route.",
+        "# TYPE db_query_duration_seconds_total counter",
+    ]
+    for (method, route), metrics in sorted(routes.items()):
+        lines.append(f"db_query_duration_seconds_total{{{_labels(method=method, route=route)}}} {metrics.db_total_ns / 1e9}")
+
+    lines += [
+        "# HELP db_slowest_query_seconds Slowest SQL statement seen, by route.",
+        "# TYPE db_slowest_query_seconds gauge",
+    ]
+    for (method, route), metrics in sorted(routes.items()):
+        if metrics.db_queries:
+            labels = _labels(method=method, route=route, statement=_one_line(metrics.db_slowest_statement))
+            lines.append(f"db_slowest_query_seconds{{{labels}}} {metrics.db_slowest_ns / 1e9}")
+
+    lines += [
+        "# HELP http_requests_in_flight Requests currently being handled.",
+        "# TYPE http_requests_in_flight gauge",
+    ]
+    for method, count in sorted(in_flight.items()):
+        lines.append(f"http_requests_in_flight{{{_labels(method=method)}}} {count}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,100 @@
+import cProfile
+import hmac
+import re
+import threading
+import time
+from pathlib import Path
+
+from starlette.responses import JSONResponse
+
+from src import config
+from src.metrics import route_label
+
+PROFILE_HEADER = b"x-profile"
+
+# cProfile hooks the interpreter through the process-wide sys.monitoring profiler
+# slot, which holds one profiler at a time, so profiled requests run one at a time
+_profiler_lock = threading.Lock()
+
+
+def file_name(scope) -> str:
+    """
+    Profile file name for a request, e.g. `POST-open_packs_user_id_pack_name-<id>.prof`.
+
+    The name is fixed the first time it is asked for, which is once routing has run.
+    """
+    if "profile_file" not in scope:
+        route = re.sub(r"[^A-Za-z0-9]+", "_", route_label(scope)).strip("_")
+        scope["profile_file"] = f"{scope['method']}-{route}-{time.strftime('%Y%m%d-%H%M%S')}-{time.perf_counter_ns()}.prof"
+    return scope["profile_file"]
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles requests carrying an authorized `X-Profile` header.
+
+    The header value must match the API key. The profile is written as a pstats dump
+    under `profile_dir` and its file name is returned in the `X-Profile-File` response
+    header.
+
+    The profiler is process-wide: while a request is profiled every thread is
+    traced, so the dump also holds whatever other requests the worker served in the
+    meantime, along with the profiled endpoint running in the threadpool. Only one
+    request can be profiled at a time; a second profiled request gets a 409 and is
+    not run.
+
+    Requests without the header only pay for one header lookup.
+    """
+
+    def __init__(self, app, profile_dir: str):
+        self.app = app
+        self.profile_dir = Path(profile_dir)
+        self.api_key = config.get_settings().API_KEY.encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = dict(scope["headers"]).get(PROFILE_HEADER)
+        if token is None or not hmac.compare_digest(token, self.api_key):
+            await self.app(scope, receive, send)
+            return
+
+        if not _profiler_lock.acquire(blocking=False):
+            await self._busy(scope, receive, send)
+            return
+
+        try:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler outside this middleware holds the slot
+                await self._busy(scope, receive, send)
+                return
+            try:
+                await self.app(scope, receive, self._with_header(send, b"x-profile-file", lambda: file_name(scope)))
+            finally:
+                profiler.disable()
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                profiler.dump_stats(self.profile_dir / file_name(scope))
+        finally:
+            _profiler_lock.release()
+
+    @staticmethod
+    async def _busy(scope, receive, send):
+        response = JSONResponse(
+            {"detail": "Another request is being profiled. Try again once it has finished."},
+            status_code=409
+        )
+        await response(scope, receive, send)
+
+    @staticmethod
+    def _with_header(send, name: bytes, value):
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                header_value = value() if callable(value) else value
+                message["headers"] = [*message.get("headers", []), (name, header_value.encode())]
+            await send(message)
+        return send_with_header
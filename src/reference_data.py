@@ -0,0 +1,122 @@
+import hashlib
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+
+import sqlalchemy
+
+from src import database as db
+from src.card_search import CardSearchIndex
+from src.sampling import AliasSampler
+
+
+@dataclass(frozen=True)
+class CardInfo:
+    id: int
+    name: str
+    type: str
+    price: int
+    pack_id: int
+
+
+@dataclass(frozen=True)
+class PackInfo:
+    id: int
+    name: str
+    price: int
+    card_ids: tuple[int, ...]
+
+
+@dataclass(frozen=True)
+class ReferenceData:
+    """
+    Immutable snapshot of the static `cards` and `packs` tables.
+
+    `version` is a digest of the loaded rows, so every worker that loads the same
+    seed data reports the same version.
+    """
+    version: str
+    cards: Mapping[int, CardInfo]
+    packs: Mapping[int, PackInfo]
+    card_ids_by_name: Mapping[str, int]
+    pack_ids_by_name: Mapping[str, int]
+    types: frozenset[str]
+    samplers: Mapping[int, AliasSampler]
+    card_search: CardSearchIndex
+
+    def find_card(self, card_name: str) -> CardInfo | None:
+        """Case-insensitive card lookup by name."""
+        card_id = self.card_ids_by_name.get(card_name.casefold())
+        return self.cards[card_id] if card_id is not None else None
+
+    def find_pack(self, pack_name: str) -> PackInfo | None:
+        """Case-insensitive pack lookup by name."""
+        pack_id = self.pack_ids_by_name.get(pack_name.casefold())
+        return self.packs[pack_id] if pack_id is not None else None
+
+
+_reference_data: ReferenceData | None = None
+_lock = threading.Lock()
+
+
+def _load() -> ReferenceData:
+    with db.engine.begin() as connection:
+        pack_rows = connection.execute(
+            sqlalchemy.text("SELECT id, name, price FROM packs ORDER BY id")
+        ).all()
+        card_rows = connection.execute(
+            sqlalchemy.text("SELECT id, name, type, price, pack_id FROM cards ORDER BY id")
+        ).all()
+
+    cards = {row.id: CardInfo(row.id, row.name, row.type, row.price, row.pack_id) for row in card_rows}
+    packs = {
+        row.id: PackInfo(
+            row.id, row.name, row.price,
+            tuple(card.id for card in cards.values() if card.pack_id == row.id)
+        )
+        for row in pack_rows
+    }
+    samplers = {
+        pack.id: AliasSampler.from_prices(pack.card_ids, [cards[card_id].price for card_id in pack.card_ids])
+        for pack in packs.values() if pack.card_ids
+    }
+    digest = hashlib.sha256(repr((pack_rows, card_rows)).encode()).hexdigest()[:16]
+
+    return ReferenceData(
+        version=digest,
+        cards=MappingProxyType(cards),
+        packs=MappingProxyType(packs),
+        card_ids_by_name=MappingProxyType({card.name.casefold(): card.id for card in cards.values()}),
+        pack_ids_by_name=MappingProxyType({pack.name.casefold(): pack.id for pack in packs.values()}),
+        types=frozenset(card.type for card in cards.values()),
+        samplers=MappingProxyType(samplers),
+        card_search=CardSearchIndex((card.id, card.name) for card in cards.values()),
+    )
+
+
+def get_reference_data() -> ReferenceData:
+    """
+    Returns the cached card and pack data, loading it from the database on first use.
+
+    The server loads it, card search index included, during startup; scripts and
+    migrations load it on first use.
+    """
+    reference_data = _reference_data
+    if reference_data is None:
+        with _lock:
+            if _reference_data is None:
+                return reload_reference_data()
+            reference_data = _reference_data
+    return reference_data
+
+
+def reload_reference_data() -> ReferenceData:
+    """
+    Reloads the cards and packs tables and swaps in the new snapshot.
+
+    Should be called after a migration changes either table.
+    """
+    global _reference_data
+    _reference_data = _load()
+    return _reference_data
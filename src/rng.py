@@ -0,0 +1,45 @@
+import threading
+
+import numpy as np
+
+from src import config
+
+# Number of values drawn at once to serve single draws
+BUFFER_SIZE = 4096
+
+# One generator per worker process, seeded by settings.RNG_SEED. Generator methods
+# hold the bit generator's lock while drawing, so threads can share it safely.
+_generator = np.random.Generator(np.random.PCG64(config.get_settings().RNG_SEED))
+_buffer_lock = threading.Lock()
+_uniforms: list[float] = []
+_position = BUFFER_SIZE
+
+
+def get_generator() -> np.random.Generator:
+    """
+    Returns the worker's generator.
+
+    Every thread of the worker draws from the same stream, so with RNG_SEED set a
+    given sequence of draws always gives the same values, whichever threadpool
+    thread serves each request. Requests served concurrently interleave their
+    draws, so only runs that send requests one at a time (benchmarks, scripts,
+    tests) are reproducible.
+    """
+    return _generator
+
+
+def uniform() -> float:
+    """
+    Returns a single float in [0, 1).
+
+    Values are served from a pre-drawn batch, so a single draw does not pay
+    NumPy's per-call overhead.
+    """
+    global _uniforms, _position
+    with _buffer_lock:
+        if _position >= BUFFER_SIZE:
+            _uniforms = _generator.random(BUFFER_SIZE).tolist()
+            _position = 0
+        value = _uniforms[_position]
+        _position += 1
+    return value
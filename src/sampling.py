@@ -0,0 +1,83 @@
+import math
+from typing import Sequence
+
+import numpy as np
+
+from src.rng import get_generator
+
+
+class AliasSampler:
+    """
+    Weighted sampler using Walker/Vose alias tables.
+
+    The tables are built once in O(n); every draw afterwards costs O(1), and any
+    number of draws is produced by a single vectorized NumPy call.
+    """
+
+    def __init__(self, keys: Sequence[int], weights: Sequence[float]):
+        """
+        Args:
+            keys (Sequence[int]): Values returned by draws, e.g. card ids.
+            weights (Sequence[float]): Non-negative relative weight of each key.
+
+        Raises:
+            ValueError: If keys and weights differ in length, are empty, or all weights are zero.
+        """
+        if len(keys) != len(weights):
+            raise ValueError("keys and weights must be the same length.")
+        if not keys:
+            raise ValueError("Cannot build a sampler over an empty list.")
+
+        total = float(sum(weights))
+        if total <= 0:
+            raise ValueError("At least one weight must be positive.")
+
+        n = len(keys)
+        self.keys = np.asarray(keys)
+        self.probabilities = np.asarray(weights, dtype=np.float64) / total
+        self._accept = np.ones(n, dtype=np.float64)
+        self._alias = np.arange(n, dtype=np.int64)
+
+        # Vose's method: pair each under-full column with an over-full one
+        scaled = (self.probabilities * n).tolist()
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self._accept[s] = scaled[s]
+            self._alias[s] = l
+            scaled[l] = (scaled[l] + scaled[s]) - 1.0
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+        # Whatever is left over is full up to rounding error
+        for i in small + large:
+            self._accept[i] = 1.0
+
+    @classmethod
+    def from_prices(cls, keys: Sequence[int], prices: Sequence[int]) -> "AliasSampler":
+        """
+        Builds a sampler biased toward lower-priced items, weighting each item by
+        sqrt(max_price - price + 1) exactly like packs.weighted_random_choice.
+        """
+        max_price = max(prices)
+        return cls(keys, [math.sqrt(max_price - price + 1) for price in prices])
+
+    def draw(self, k: int, rng: np.random.Generator | None = None) -> np.ndarray:
+        """
+        Draws k keys independently with replacement.
+
+        Args:
+            k (int): Number of draws.
+            rng (np.random.Generator, optional): Generator to draw from. Defaults to the
+                worker's generator from src.rng.
+
+        Returns:
+            np.ndarray: Array of k drawn keys.
+        """
+        rng = rng or get_generator()
+        columns = rng.integers(0, len(self.keys), size=k)
+        accepted = rng.random(k) < self._accept[columns]
+        return self.keys[np.where(accepted, columns, self._alias[columns])]
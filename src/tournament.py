@@ -0,0 +1,62 @@
+import numpy as np
+
+from src.rng import get_generator
+
+# Most matches drawn at once; bounds the memory of one block of the outcome matrix
+MAX_BLOCK_MATCHES = 1 << 22
+
+
+def match_probabilities(strengths: np.ndarray, opponents: np.ndarray) -> np.ndarray:
+    """
+    Probability that each deck in `strengths` (rows) beats each deck in `opponents` (columns).
+
+    Decks are rated by their battle win probability and matched Bradley-Terry style,
+    so deck i beats deck j with probability p_i / (p_i + p_j). Two decks that both
+    have a win probability of zero are an even match.
+    """
+    totals = strengths[:, None] + opponents[None, :]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        probabilities = strengths[:, None] / totals
+    return np.where(totals > 0, probabilities, 0.5)
+
+
+def round_robin(strengths, rng: np.random.Generator | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Plays every deck against every other deck once.
+
+    The upper triangle of the outcome matrix is drawn a block of rows at a time, so
+    n decks cost O(n^2) vectorized work but only O(MAX_BLOCK_MATCHES) memory.
+
+    Args:
+        strengths (Sequence[float]): Win probability of each deck.
+        rng (np.random.Generator, optional): Generator to draw from. Defaults to the
+            worker's generator from src.rng.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Wins of each deck, and its expected number of wins.
+    """
+    rng = rng or get_generator()
+    strengths = np.asarray(strengths, dtype=np.float64)
+    n = len(strengths)
+    wins = np.zeros(n, dtype=np.int64)
+    expected_wins = np.zeros(n, dtype=np.float64)
+
+    block_rows = max(1, MAX_BLOCK_MATCHES // max(n, 1))
+    for start in range(0, n, block_rows):
+        stop = min(start + block_rows, n)
+        # Row i only plays the columns j > i, so every pair is drawn exactly once
+        columns = np.arange(start + 1, n)
+        if len(columns) == 0:
+            break
+        played = columns[None, :] > np.arange(start, stop)[:, None]
+
+        probabilities = match_probabilities(strengths[start:stop], strengths[start + 1:])
+        row_wins = (rng.random(probabilities.shape) < probabilities) & played
+        column_wins = ~row_wins & played
+
+        wins[start:stop] += row_wins.sum(axis=1)
+        wins[start + 1:] += column_wins.sum(axis=0)
+        expected_wins[start:stop] += np.where(played, probabilities, 0.0).sum(axis=1)
+        expected_wins[start + 1:] += np.where(played, 1.0 - probabilities, 0.0).sum(axis=0)
+
+    return wins, expected_wins